@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import pydantic
+from openai.types.chat import ChatCompletion, ParsedChatCompletion
+
+
+def canonical_value(value):
+    """
+    Valores de la solicitud que no son JSON: un modelo de pydantic usado como response_format
+    se representa con su esquema, y una instancia, con sus datos.
+    """
+    if isinstance(value, type) and issubclass(value, pydantic.BaseModel):
+        return value.model_json_schema()
+    if isinstance(value, pydantic.BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"No se puede usar {type(value).__name__} como parte de la clave del caché")
+
+
+def request_key(method, base_url, request):
+    """
+    Hash del JSON canónico (claves ordenadas, sin espacios) de la solicitud: endpoint, método,
+    modelo, mensajes, temperatura, seed, esquema de response_format y el resto de parámetros.
+    """
+    canonical = json.dumps(
+        {"base_url": base_url, "method": method, "request": request},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+        default=canonical_value,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def is_sampled(request):
+    """
+    Si la respuesta se muestrea al azar: temperatura > 0 (la API usa 1 si no se indica o es None) y sin seed.
+    """
+    temperature = request.get("temperature")
+    return (1 if temperature is None else temperature) > 0 and request.get("seed") is None
+
+
+class CompletionCache:
+    """
+    Caché en disco (SQLite) de respuestas de chat completions, compartido entre procesos y ejecuciones:
+    volver a enviar una solicitud idéntica no llama a la API. Las entradas expiran a los `ttl_seconds`
+    y, si el caché supera `max_bytes`, se descartan las usadas hace más tiempo.
+    Con `cache_sampled=False` no se guardan las respuestas muestreadas (temperatura > 0 sin seed),
+    así que cada ejecución obtiene una respuesta nueva. Las respuestas en streaming nunca se guardan.
+    """
+
+    def __init__(self, path, ttl_seconds=7 * 24 * 60 * 60, max_bytes=100 * 1024 * 1024, cache_sampled=True):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.cache_sampled = cache_sampled
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS completions (key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+                "size INTEGER NOT NULL, created_at REAL NOT NULL, used_at REAL NOT NULL)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS completions_used_at ON completions (used_at)")
+
+    def get(self, key):
+        """
+        Devolver el JSON de la respuesta guardada, o None si no está o expiró.
+        """
+        now = time.time()
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT response, created_at FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self.connection.execute("UPDATE completions SET used_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, response_json):
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO completions (key, response, size, created_at, used_at) VALUES (?, ?, ?, ?, ?)",
+                (key, response_json, len(response_json.encode("utf-8")), now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now):
+        """
+        Borrar las entradas expiradas y, si aún se supera `max_bytes`, las usadas hace más tiempo.
+        """
+        self.connection.execute("DELETE FROM completions WHERE created_at < ?", (now - self.ttl_seconds,))
+        total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        excess = total - self.max_bytes
+        if excess <= 0:
+            return
+        evicted = []
+        for key, size in self.connection.execute("SELECT key, size FROM completions ORDER BY used_at"):
+            if excess <= 0:
+                break
+            evicted.append((key,))
+            excess -= size
+        self.connection.executemany("DELETE FROM completions WHERE key = ?", evicted)
+
+    def call(self, method, base_url, response_class, function, request):
+        """
+        Devolver la respuesta guardada para la solicitud o hacer la llamada con `function(**request)`
+        y guardar su respuesta.
+        """
+        if request.get("stream") or (not self.cache_sampled and is_sampled(request)):
+            self.skipped += 1
+            return function(**request)
+        key = request_key(method, base_url, request)
+        cached = self.get(key)
+        if cached is not None:
+            return response_class.model_validate_json(cached)
+        response = function(**request)
+        # ParsedChatCompletion declara `parsed` de tipo genérico, así que pydantic avisaría en cada escritura
+        # aunque el JSON es correcto (model_validate_json con la clase concreta vuelve a validar el modelo)
+        self.put(key, response.model_dump_json(warnings=False))
+        return response
+
+    def stats(self):
+        """
+        Contadores de aciertos, fallos, solicitudes que no pasan por el caché y tamaño en disco.
+        """
+        with self.lock:
+            entries, size = self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self):
+        self.connection.close()
+
+
+def cache_from_env():
+    """
+    Caché configurado en el entorno: COMPLETION_CACHE_PATH (si no se define, no hay caché),
+    COMPLETION_CACHE_TTL_SECONDS, COMPLETION_CACHE_MAX_MB y COMPLETION_CACHE_SAMPLED
+    ("false" para no guardar las respuestas muestreadas).
+    """
+    path = os.getenv("COMPLETION_CACHE_PATH")
+    if not path:
+        return None
+    return CompletionCache(
+        path,
+        ttl_seconds=int(os.getenv("COMPLETION_CACHE_TTL_SECONDS", str(7 * 24 * 60 * 60))),
+        max_bytes=int(os.getenv("COMPLETION_CACHE_MAX_MB", "100")) * 1024 * 1024,
+        cache_sampled=os.getenv("COMPLETION_CACHE_SAMPLED", "true").lower() == "true",
+    )
+
+
+class Override:
+    """
+    Objeto que delega todos sus atributos en `target`, salvo los que se reemplazan.
+    """
+
+    def __init__(self, target, **overrides):
+        self.target = target
+        self.__dict__.update(overrides)
+
+    def __getattr__(self, name):
+        return getattr(self.target, name)
+
+
+def cached_client(client, cache):
+    """
+    Envolver un cliente síncrono de OpenAI para que chat.completions.create y (beta.)chat.completions.parse
+    pasen por `cache`; el resto del cliente se usa tal cual. Con `cache=None` devuelve el mismo cliente.
+    """
+    if cache is None:
+        return client
+    base_url = str(client.base_url)
+
+    def cached(completions, method):
+        function = getattr(completions, method)
+
+        def call(**request):
+            if method == "parse" and isinstance(request.get("response_format"), type):
+                response_class = ParsedChatCompletion[request["response_format"]]
+            else:
+                response_class = ParsedChatCompletion if method == "parse" else ChatCompletion
+            return cache.call(method, base_url, response_class, function, request)
+
+        return call
+
+    def cached_completions(completions):
+        methods = [method for method in ("create", "parse") if hasattr(completions, method)]
+        return Override(completions, **{method: cached(completions, method) for method in methods})
+
+    return Override(
+        client,
+        chat=Override(client.chat, completions=cached_completions(client.chat.completions)),
+        beta=Override(
+            client.beta, chat=Override(client.beta.chat, completions=cached_completions(client.beta.chat.completions))
+        ),
+    )
@@ -0,0 +1,131 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Encabezados con los que los scripts adjuntan las fuentes a la pregunta del usuario
+SOURCE_MARKERS = ("\nFuentes:", "\nSources:")
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_SYSTEM_MESSAGE = """
+Resume la conversación entre un usuario y un asistente para que el asistente pueda continuarla.
+Conserva los datos concretos (nombres, cifras, preferencias del usuario) y las preguntas pendientes.
+Integra el resumen anterior, si lo hay, con los nuevos mensajes. Responde SÓLO con el resumen.
+"""
+
+
+def strip_sources(content):
+    """
+    Quitar el bloque de fuentes que se adjuntó a un mensaje del usuario:
+    ya se usó para responder ese turno y reenviarlo sólo agranda el prompt.
+    """
+    for marker in SOURCE_MARKERS:
+        position = content.find(marker)
+        if position != -1:
+            content = content[:position]
+    return content
+
+
+class ConversationMemory:
+    """
+    Historial de conversación acotado: guarda los últimos `max_turns` turnos tal cual
+    (sin los bloques de fuentes) y resume los turnos más antiguos en un hilo en segundo plano,
+    así que el prompt de cada turno no crece con la duración de la sesión.
+    Sin `client`, los turnos antiguos simplemente se descartan. Si resumir falla, el error se registra
+    y los turnos se reintentan en el siguiente resumen, pero nunca se guardan más de `max_pending_turns`
+    sin resumir: los más antiguos se descartan.
+    """
+
+    def __init__(
+        self, system_message, client=None, model_name=None, max_turns=4, max_summary_tokens=400, max_pending_turns=8
+    ):
+        self.system_message = system_message
+        self.client = client
+        self.model_name = model_name
+        self.max_turns = max_turns
+        self.max_summary_tokens = max_summary_tokens
+        self.max_pending_turns = max_pending_turns
+        self.summary = ""
+        self.turns = []
+        # Turnos que salieron de la ventana pero todavía no están en el resumen
+        self.pending = []
+        self.lock = threading.Lock()
+        # Un solo hilo: los resúmenes se aplican en orden y nunca bloquean el turno actual
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="conversation-memory")
+
+    def add_turn(self, user_content, assistant_content):
+        """
+        Registrar un turno completo y, si la ventana se llenó, mandar a resumir los turnos más antiguos.
+        """
+        turn = [
+            {"role": "user", "content": strip_sources(user_content)},
+            {"role": "assistant", "content": assistant_content},
+        ]
+        with self.lock:
+            self.turns.append(turn)
+            evicted = self.turns[: -self.max_turns]
+            self.turns = self.turns[-self.max_turns :]
+            if self.client is not None:
+                self.pending.extend(evicted)
+                dropped = len(self.pending) - self.max_pending_turns
+                if dropped > 0:
+                    logger.warning("Se descartan %d turnos que no se pudieron resumir", dropped)
+                    self.pending = self.pending[dropped:]
+        if evicted and self.client is not None:
+            self.executor.submit(self._summarize_pending)
+
+    def _summarize_pending(self):
+        with self.lock:
+            batch = list(self.pending)
+            previous_summary = self.summary
+        if not batch:
+            return
+        transcript = "\n".join(f"{message['role']}: {message['content']}" for turn in batch for message in turn)
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model_name,
+                temperature=0.0,
+                max_tokens=self.max_summary_tokens,
+                messages=[
+                    {"role": "system", "content": SUMMARY_SYSTEM_MESSAGE},
+                    {
+                        "role": "user",
+                        "content": f"Resumen anterior:\n{previous_summary}\n\nNuevos mensajes:\n{transcript}",
+                    },
+                ],
+            )
+            summary = response.choices[0].message.content.strip()
+        except Exception:
+            # Se ejecuta en el executor y nadie espera el resultado: sin esto el error se perdería
+            logger.exception("No se pudo resumir el historial; se reintentará en el próximo turno")
+            return
+        with self.lock:
+            self.summary = summary
+            # Quitar sólo los turnos resumidos que siguen pendientes (algunos pudieron descartarse entretanto)
+            summarized = {id(turn) for turn in batch}
+            self.pending = [turn for turn in self.pending if id(turn) not in summarized]
+
+    def messages(self, user_content):
+        """
+        Mensajes para la siguiente llamada: sistema (con el resumen), turnos recientes
+        y el nuevo mensaje del usuario. Los turnos que aún se están resumiendo se envían tal cual.
+        """
+        with self.lock:
+            system_content = self.system_message
+            if self.summary:
+                system_content += f"\n\nResumen de la conversación anterior:\n{self.summary}"
+            history = [message for turn in self.pending + self.turns for message in turn]
+        return [{"role": "system", "content": system_content}, *history, {"role": "user", "content": user_content}]
+
+    def history_text(self):
+        """
+        Historial compacto como texto plano (resumen y turnos recientes), para incluirlo en otros prompts.
+        """
+        with self.lock:
+            lines = [f"resumen: {self.summary}"] if self.summary else []
+            history = [message for turn in self.pending + self.turns for message in turn]
+        lines += [f"{message['role']}: {message['content']}" for message in history]
+        return "\n".join(lines)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
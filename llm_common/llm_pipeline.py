@@ -0,0 +1,122 @@
+import asyncio
+import string
+
+import openai
+
+
+class Step:
+    """
+    Paso de una cadena: una llamada al modelo cuyo prompt es una plantilla de `str.format`.
+    Los campos de la plantilla son la entrada ({input}) o los nombres de pasos anteriores,
+    y de ellos salen las dependencias del paso (para llaves literales, usar {{ y }}).
+    """
+
+    def __init__(self, name, prompt, temperature=0.7):
+        self.name = name
+        self.prompt = prompt
+        self.temperature = temperature
+        fields = [field for _, field, _, _ in string.Formatter().parse(prompt) if field]
+        self.depends_on = [field for field in dict.fromkeys(fields) if field != "input"]
+
+
+class Pipeline:
+    """
+    Cadena de llamadas al modelo como grafo de dependencias: cada paso empieza en cuanto terminan
+    los pasos que usa, así que los pasos independientes se piden a la vez. El último paso de la lista
+    es el resultado final y se puede recibir token a token.
+    Un semáforo limita las solicitudes en vuelo, compartido entre todas las entradas que se procesan a la vez.
+    """
+
+    def __init__(self, client, model_name, steps, max_concurrency=8):
+        defined = {"input"}
+        for step in steps:
+            missing = [name for name in step.depends_on if name not in defined]
+            if missing:
+                raise ValueError(f"El paso {step.name!r} usa {missing}, que no son pasos anteriores")
+            defined.add(step.name)
+        self.client = client
+        self.model_name = model_name
+        self.steps = steps
+        self.max_concurrency = max_concurrency
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def complete(self, step, results, on_token=None):
+        """
+        Ejecutar un paso con los resultados disponibles. Con `on_token`, la respuesta llega en streaming
+        y cada fragmento de texto se pasa a `on_token` a medida que llega.
+        """
+        messages = [{"role": "user", "content": step.prompt.format(**results)}]
+        async with self.semaphore:
+            if on_token is None:
+                response = await self.client.chat.completions.create(
+                    model=self.model_name, temperature=step.temperature, messages=messages
+                )
+                return response.choices[0].message.content
+            stream = await self.client.chat.completions.create(
+                model=self.model_name, temperature=step.temperature, messages=messages, stream=True
+            )
+            parts = []
+            async for event in stream:
+                if event.choices:
+                    content = event.choices[0].delta.content
+                    if content:
+                        parts.append(content)
+                        on_token(content)
+            return "".join(parts)
+
+    async def run(self, document, on_token=None, on_step=None):
+        """
+        Ejecutar la cadena para una entrada y devolver {"input": entrada, nombre del paso: texto, ...}.
+        `on_token` recibe los fragmentos del último paso a medida que llegan y
+        `on_step` recibe (nombre, texto) de cada paso intermedio en cuanto termina.
+        """
+        results = {"input": document}
+        final_step = self.steps[-1]
+        tasks = {}
+
+        async def run_step(step):
+            await asyncio.gather(*(tasks[name] for name in step.depends_on))
+            results[step.name] = await self.complete(step, results, on_token if step is final_step else None)
+            if on_step is not None and step is not final_step:
+                on_step(step.name, results[step.name])
+
+        for step in self.steps:
+            tasks[step.name] = asyncio.create_task(run_step(step))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        return results
+
+    async def run_many(self, documents):
+        """
+        Procesar muchas entradas con a lo sumo `max_concurrency` cadenas en curso a la vez.
+        Entrega (posición, resultados) a medida que cada cadena termina, en el orden en que terminan.
+        Si una cadena falla por un error de la API, se entrega la excepción en lugar de los resultados
+        y las demás siguen.
+        """
+        pending = iter(enumerate(documents))
+        finished = asyncio.Queue()
+
+        async def work():
+            for index, document in pending:
+                try:
+                    outcome = await self.run(document)
+                except openai.APIError as error:
+                    outcome = error
+                await finished.put((index, outcome))
+
+        async def produce():
+            try:
+                async with asyncio.TaskGroup() as group:
+                    for _ in range(self.max_concurrency):
+                        group.create_task(work())
+            finally:
+                await finished.put(None)
+
+        producer = asyncio.create_task(produce())
+        while (item := await finished.get()) is not None:
+            yield item
+        await producer
@@ -0,0 +1,128 @@
+import argparse
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from llm_common.vector_store import normalize, top_k_indices
+
+
+def load_embedding_file(path):
+    """
+    Leer un archivo de embeddings {clave: vector} y devolver las claves y la matriz normalizada.
+    """
+    with open(path, encoding="utf-8") as file:
+        vectors = json.load(file)
+    return list(vectors), normalize(np.array(list(vectors.values()), dtype=np.float32))
+
+
+def fingerprint(embeddings_path):
+    """
+    Huella barata de un archivo de embeddings: su tamaño y fecha de modificación, sin leer los vectores.
+    """
+    stat = os.stat(embeddings_path)
+    return hashlib.sha256(json.dumps([stat.st_size, stat.st_mtime_ns]).encode("utf-8")).hexdigest()
+
+
+def blocked_top_k(vectors, k, block_size=1024, exclude_self=True):
+    """
+    Los `k` vecinos más similares de cada vector (similitud del coseno sobre vectores normalizados),
+    calculando la matriz de todos contra todos por bloques de `block_size` filas:
+    la memoria es block_size x n en lugar de n x n.
+    Devuelve las matrices de índices (int32) y similitudes (float32), de forma (n, k).
+    """
+    count = len(vectors)
+    k = min(k, count - 1 if exclude_self else count)
+    indices = np.empty((count, k), dtype=np.int32)
+    similarities = np.empty((count, k), dtype=np.float32)
+    for start in range(0, count, block_size):
+        end = min(start + block_size, count)
+        block = vectors[start:end] @ vectors.T
+        if exclude_self:
+            block[np.arange(end - start), np.arange(start, end)] = -np.inf
+        block_indices = top_k_indices(block, k)
+        indices[start:end] = block_indices
+        similarities[start:end] = np.take_along_axis(block, block_indices, axis=-1)
+    return indices, similarities
+
+
+class NeighborTable:
+    """
+    Tabla precalculada con los `k` vecinos más similares de cada elemento de un archivo de embeddings,
+    así que "elementos parecidos a X" es una búsqueda en un diccionario en lugar de recorrer todos los vectores.
+    """
+
+    def __init__(self, keys, indices, similarities):
+        self.keys = keys
+        self.rows = {key: row for row, key in enumerate(keys)}
+        self.indices = indices
+        self.similarities = similarities
+
+    @classmethod
+    def build(cls, keys, vectors, k=20, block_size=1024):
+        indices, similarities = blocked_top_k(normalize(np.asarray(vectors, dtype=np.float32)), k, block_size)
+        return cls(keys, indices, similarities)
+
+    def most_similar(self, key, limit=10):
+        """
+        Devolver [(clave, similitud), ...] con los vecinos más similares a `key`, sin incluirla.
+        """
+        row = self.rows[key]
+        return [
+            (self.keys[index], float(similarity))
+            for index, similarity in zip(self.indices[row, :limit].tolist(), self.similarities[row, :limit].tolist())
+        ]
+
+    def save(self, path, source_fingerprint=""):
+        temp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            temp_path,
+            fingerprint=np.array(source_fingerprint),
+            keys=np.array(json.dumps(self.keys, ensure_ascii=False)),
+            indices=self.indices,
+            similarities=self.similarities,
+        )
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path, source_fingerprint=None):
+        """
+        Cargar una tabla guardada; devuelve None si no existe o si la huella no coincide.
+        """
+        try:
+            data = np.load(path)
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+        with data:
+            if source_fingerprint is not None and str(data["fingerprint"]) != source_fingerprint:
+                return None
+            return cls(json.loads(str(data["keys"])), data["indices"], data["similarities"])
+
+    @classmethod
+    def load_or_build(cls, embeddings_path, k=20, path=None):
+        """
+        Reutilizar la tabla guardada junto al archivo de embeddings (`<archivo>.neighbors.npz`)
+        si el archivo no cambió (mismo tamaño y fecha) y tiene al menos `k` vecinos; si no, calcularla y guardarla.
+        Los vectores sólo se leen al recalcular la tabla.
+        """
+        path = path or Path(embeddings_path).with_suffix(".neighbors.npz")
+        source_fingerprint = fingerprint(embeddings_path)
+        table = cls.load(path, source_fingerprint)
+        if table is None or table.indices.shape[1] < min(k, len(table.keys) - 1):
+            keys, vectors = load_embedding_file(embeddings_path)
+            table = cls.build(keys, vectors, k)
+            table.save(path, source_fingerprint)
+        return table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precalcular los vecinos más similares de un archivo de embeddings.")
+    parser.add_argument("embeddings_path", nargs="+")
+    parser.add_argument("--k", type=int, default=20)
+    args = parser.parse_args()
+
+    for embeddings_path in args.embeddings_path:
+        NeighborTable.load_or_build(embeddings_path, k=args.k)
+        print(f"Vecinos de {embeddings_path} listos.")
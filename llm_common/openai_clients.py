@@ -0,0 +1,105 @@
+import functools
+import importlib.util
+import json
+import os
+
+import httpx
+import openai
+
+AZURE_SCOPE = "https://cognitiveservices.azure.com/.default"
+GITHUB_MODELS_ENDPOINT = "https://models.github.ai/inference"
+
+# Pool de conexiones compartido por todos los clientes del proceso: conexiones persistentes
+# (keep-alive), HTTP/2 si está instalado el paquete h2, y límites y tiempos de espera explícitos
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60)
+HTTP_TIMEOUT = httpx.Timeout(120, connect=10)
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def get_host(default="github"):
+    """
+    Proveedor configurado en el entorno con API_HOST.
+    """
+    return os.getenv("API_HOST", default)
+
+
+@functools.cache
+def get_http_client(asynchronous=False):
+    """
+    Cliente HTTP compartido (síncrono o asíncrono) con el pool de conexiones del proceso.
+    Bajo startup_profiler.py registra además el momento de cada respuesta de la API.
+    """
+    event_hooks = {}
+    if os.getenv("STARTUP_PROFILE"):
+        from llm_common.startup_profiler import response_hooks
+
+        event_hooks = response_hooks(asynchronous)
+    http_client_class = openai.DefaultAsyncHttpxClient if asynchronous else openai.DefaultHttpxClient
+    return http_client_class(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT, http2=HTTP2_AVAILABLE, event_hooks=event_hooks)
+
+
+@functools.cache
+def get_token_provider(asynchronous=False, credential="default", tenant_id=None):
+    """
+    Proveedor de tokens de Entra ID para Azure OpenAI, creado una sola vez por proceso y credencial.
+    azure.identity se importa aquí, así que los demás proveedores no pagan su tiempo de carga.
+    `credential` es "default" (DefaultAzureCredential) o "azure_developer_cli"
+    (AzureDeveloperCliCredential, con el `tenant_id` indicado).
+    """
+    if asynchronous:
+        from azure.identity import aio as identity
+    else:
+        from azure import identity
+
+    if credential == "azure_developer_cli":
+        azure_credential = identity.AzureDeveloperCliCredential(tenant_id=tenant_id)
+    elif credential == "default":
+        azure_credential = identity.DefaultAzureCredential()
+    else:
+        raise ValueError(f"Credencial de Azure no soportada: {credential}. Usa 'default' o 'azure_developer_cli'")
+    return identity.get_bearer_token_provider(azure_credential, AZURE_SCOPE)
+
+
+def get_model_name(host=None):
+    """
+    Nombre del modelo (o deployment de Azure) de chat para el proveedor.
+    """
+    host = host or get_host()
+    if host == "azure":
+        return os.environ["AZURE_OPENAI_CHAT_DEPLOYMENT"]
+    if host == "ollama":
+        return os.environ["OLLAMA_MODEL"]
+    if host == "github":
+        return os.getenv("GITHUB_MODEL", "openai/gpt-4o")
+    return os.environ["OPENAI_MODEL"]
+
+
+def get_client(host=None, asynchronous=False, credential="default", tenant_id=None, **client_options):
+    """
+    Cliente de OpenAI (síncrono o asíncrono) para el proveedor: azure, ollama, github u openai.
+    Los clientes se reutilizan por proveedor y opciones, y todos comparten el pool de conexiones.
+    Con azure, `credential` y `tenant_id` eligen la credencial de Entra ID (ver `get_token_provider`), y el endpoint
+    sale de AZURE_OPENAI_ENDPOINT salvo que se pase un base_url propio.
+    `client_options` se pasan al constructor (p. ej. max_retries, default_query o un base_url propio).
+    """
+    host = host or get_host()
+    return _get_client(host, asynchronous, credential, tenant_id, json.dumps(client_options, sort_keys=True))
+
+
+@functools.cache
+def _get_client(host, asynchronous, credential, tenant_id, client_options_json):
+    client_options = json.loads(client_options_json)
+    if host == "azure":
+        # Sin endpoint el SDK usaría api.openai.com y le enviaría el token de Entra ID
+        base_url = client_options.pop("base_url", None) or os.getenv("AZURE_OPENAI_ENDPOINT")
+        if not base_url:
+            raise ValueError("Falta el endpoint de Azure OpenAI: define AZURE_OPENAI_ENDPOINT o pasa base_url")
+        connection = {"base_url": base_url, "api_key": get_token_provider(asynchronous, credential, tenant_id)}
+    elif host == "ollama":
+        connection = {"base_url": os.environ["OLLAMA_ENDPOINT"], "api_key": "nokeyneeded"}
+    elif host == "github":
+        connection = {"base_url": GITHUB_MODELS_ENDPOINT, "api_key": os.environ["GITHUB_TOKEN"]}
+    else:
+        connection = {"api_key": os.environ["OPENAI_KEY"]}
+    client_class = openai.AsyncOpenAI if asynchronous else openai.OpenAI
+    return client_class(**{**connection, **client_options}, http_client=get_http_client(asynchronous))
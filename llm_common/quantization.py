@@ -0,0 +1,174 @@
+import numpy as np
+
+from llm_common.vector_store import normalize, top_k_indices
+
+if hasattr(np, "bitwise_count"):
+    popcount = np.bitwise_count
+else:
+    # NumPy < 2.0: contamos bits con una tabla de 256 entradas sobre la vista en bytes
+    POPCOUNT_TABLE = np.array([i.bit_count() for i in range(256)], dtype=np.uint8)
+
+    def popcount(values):
+        values = np.ascontiguousarray(values)
+        return POPCOUNT_TABLE[values.view(np.uint8)].reshape(*values.shape, -1).sum(axis=-1, dtype=np.uint8)
+
+
+class ScalarQuantizer:
+    """
+    Cuantización escalar a int8 calibrada por dimensión: cada dimensión usa su propio
+    mínimo y escala, así que no se desperdician niveles en dimensiones con poco rango.
+    """
+
+    def __init__(self, minimums, scales):
+        self.minimums = np.asarray(minimums, dtype=np.float32)
+        self.scales = np.asarray(scales, dtype=np.float32)
+
+    @classmethod
+    def fit(cls, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        minimums = vectors.min(axis=0)
+        scales = (vectors.max(axis=0) - minimums) / 255
+        scales[scales == 0] = 1
+        return cls(minimums, scales)
+
+    def encode(self, vectors):
+        levels = np.rint((np.asarray(vectors, dtype=np.float32) - self.minimums) / self.scales)
+        return (np.clip(levels, 0, 255) - 128).astype(np.int8)
+
+    def decode(self, codes):
+        return (codes.astype(np.float32) + 128) * self.scales + self.minimums
+
+
+class BinaryQuantizer:
+    """
+    Cuantización binaria: un bit por dimensión (1 si supera la media de esa dimensión),
+    empaquetado con `np.packbits`, así que cada vector ocupa dimensiones / 8 bytes.
+    """
+
+    def __init__(self, thresholds):
+        self.thresholds = np.asarray(thresholds, dtype=np.float32)
+
+    @classmethod
+    def fit(cls, vectors):
+        return cls(np.asarray(vectors, dtype=np.float32).mean(axis=0))
+
+    def encode(self, vectors):
+        bits = np.asarray(vectors, dtype=np.float32) > self.thresholds
+        packed = np.packbits(bits, axis=-1)
+        # Rellenar hasta múltiplos de 8 bytes para poder comparar de a 64 bits
+        padding = -packed.shape[-1] % 8
+        if padding:
+            packed = np.pad(packed, [(0, 0)] * (packed.ndim - 1) + [(0, padding)])
+        return np.ascontiguousarray(packed).view(np.uint64)
+
+
+class QuantizedIndex:
+    """
+    Búsqueda sobre códigos cuantizados con la misma interfaz que `VectorStore`.
+    Si se conservan los vectores originales (en memoria o mapeados desde disco con `np.memmap`),
+    los `limit * rescore_factor` mejores candidatos se vuelven a puntuar con la similitud exacta;
+    en memoria, esos vectores ocupan más que los códigos (ver `memory_bytes`).
+    """
+
+    def __init__(self, documents, codes, quantizer, vectors=None, rescore_factor=4):
+        self.documents = documents
+        self.documents_by_id = {doc["id"]: doc for doc in documents}
+        self.codes = codes
+        self.quantizer = quantizer
+        self.vectors = vectors
+        self.rescore_factor = rescore_factor
+
+    @classmethod
+    def from_vectors(cls, documents, vectors, keep_vectors=False, rescore_factor=4):
+        """
+        Calibrar el cuantizador y codificar los vectores. Con `keep_vectors=True` se guardan además
+        los vectores normalizados en memoria para volver a puntuar; si no, sólo se usan los códigos.
+        """
+        vectors = normalize(np.asarray(vectors, dtype=np.float32))
+        quantizer = cls.quantizer_class.fit(vectors)
+        return cls(
+            documents,
+            quantizer.encode(vectors),
+            quantizer,
+            vectors=vectors if keep_vectors else None,
+            rescore_factor=rescore_factor,
+        )
+
+    def __len__(self):
+        return len(self.documents)
+
+    def memory_bytes(self):
+        """
+        Bytes residentes del índice: los códigos y, si están en memoria, los vectores para volver a puntuar
+        (un `np.memmap` no cuenta, ya que sus páginas se leen del disco sólo para los candidatos).
+        """
+        if self.vectors is None or isinstance(self.vectors, np.memmap):
+            return self.codes.nbytes
+        return self.codes.nbytes + self.vectors.nbytes
+
+    def search(self, query_embedding, limit):
+        """
+        Devolver los `limit` documentos más similares al embedding de la consulta,
+        como una lista de tuplas (documento, similitud) ordenadas de mayor a menor.
+        """
+        return self.search_batch([query_embedding], limit)[0]
+
+    def search_batch(self, query_embeddings, limit):
+        queries = normalize(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        scores = self.approximate_similarities(queries)
+        if self.vectors is None or not self.rescore_factor:
+            indices = top_k_indices(scores, limit)
+            similarities = np.take_along_axis(scores, indices, axis=-1)
+        else:
+            candidates = top_k_indices(scores, limit * self.rescore_factor)
+            # Similitud exacta sólo para los candidatos: vectores (consultas, candidatos, dimensiones)
+            exact = np.einsum("qd,qcd->qc", queries, np.asarray(self.vectors[candidates], dtype=np.float32))
+            order = top_k_indices(exact, limit)
+            indices = np.take_along_axis(candidates, order, axis=-1)
+            similarities = np.take_along_axis(exact, order, axis=-1)
+        return [
+            [(self.documents[i], float(similarity)) for i, similarity in zip(row_indices, row_similarities)]
+            for row_indices, row_similarities in zip(indices.tolist(), similarities.tolist())
+        ]
+
+
+class Int8Index(QuantizedIndex):
+    """
+    Índice con códigos int8 (4 veces menos memoria que float32).
+    La consulta queda en float32 (cuantización asimétrica): el producto punto con un código es
+    (consulta * escalas) · código + una constante por consulta. NumPy no tiene productos de matrices
+    int8 optimizados, así que los códigos se convierten a float32 por bloques de `block_size` filas:
+    la ganancia es sólo de memoria; la búsqueda es más lenta que la exacta en float32.
+    """
+
+    quantizer_class = ScalarQuantizer
+    # Bloques pequeños: la copia en float32 queda en la caché del procesador para el producto
+    block_size = 64
+
+    def approximate_similarities(self, queries):
+        scaled_queries = queries * self.quantizer.scales
+        offsets = 128 * scaled_queries.sum(axis=1) + queries @ self.quantizer.minimums
+        scores = np.empty((len(queries), len(self.codes)), dtype=np.float32)
+        buffer = np.empty((self.block_size, self.codes.shape[1]), dtype=np.float32)
+        for start in range(0, len(self.codes), self.block_size):
+            block = self.codes[start : start + self.block_size]
+            np.copyto(buffer[: len(block)], block, casting="unsafe")
+            scores[:, start : start + len(block)] = scaled_queries @ buffer[: len(block)].T
+        return scores + offsets[:, None]
+
+
+class BinaryIndex(QuantizedIndex):
+    """
+    Índice con códigos binarios empaquetados (32 veces menos memoria que float32).
+    La distancia de Hamming se calcula con XOR y conteo de bits sobre palabras de 64 bits;
+    la similitud aproximada es el coseno del ángulo estimado, cos(pi * hamming / dimensiones).
+    """
+
+    quantizer_class = BinaryQuantizer
+
+    def approximate_similarities(self, queries):
+        query_codes = self.quantizer.encode(queries)
+        distances = np.stack(
+            [popcount(self.codes ^ query_code).sum(axis=1, dtype=np.int32) for query_code in query_codes]
+        )
+        return np.cos(np.pi * distances / len(self.quantizer.thresholds)).astype(np.float32)
@@ -0,0 +1,127 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_query(text):
+    """
+    Normalizar el texto de la consulta para que variantes triviales compartan entrada:
+    forma Unicode NFKC, minúsculas y espacios colapsados.
+    """
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text).lower()).strip()
+
+
+class QueryEmbeddingCache:
+    """
+    Caché de embeddings de consultas en dos niveles:
+    un LRU en memoria con TTL y, opcionalmente, una tabla SQLite en disco
+    que se comparte entre procesos y sobrevive a reinicios.
+    La clave es (texto normalizado, modelo, dimensiones).
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=24 * 60 * 60, disk_path=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.connection = None
+        if disk_path:
+            self.connection = sqlite3.connect(disk_path, check_same_thread=False)
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings "
+                "(key TEXT PRIMARY KEY, embedding BLOB NOT NULL, created_at REAL NOT NULL)"
+            )
+
+    @staticmethod
+    def make_key(text, model, dimensions=None):
+        raw_key = f"{model}\x00{dimensions or ''}\x00{normalize_query(text)}"
+        return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+    def get(self, text, model, dimensions=None):
+        """
+        Buscar el embedding en memoria y luego en disco. Devuelve None si no está o expiró.
+        """
+        key = self.make_key(text, model, dimensions)
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None and now - entry[1] <= self.ttl_seconds:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.memory.pop(key, None)
+            if self.connection is not None:
+                row = self.connection.execute(
+                    "SELECT embedding, created_at FROM query_embeddings WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[1] <= self.ttl_seconds:
+                    embedding = np.frombuffer(row[0], dtype=np.float32)
+                    self._remember(key, embedding, row[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return embedding
+            self.misses += 1
+            return None
+
+    def put(self, text, model, embedding, dimensions=None):
+        """
+        Guardar el embedding en memoria y, si está configurado, en disco.
+        """
+        key = self.make_key(text, model, dimensions)
+        embedding = np.asarray(embedding, dtype=np.float32)
+        created_at = time.time()
+        with self.lock:
+            self._remember(key, embedding, created_at)
+            if self.connection is not None:
+                with self.connection:
+                    self.connection.execute(
+                        "INSERT OR REPLACE INTO query_embeddings (key, embedding, created_at) VALUES (?, ?, ?)",
+                        (key, embedding.tobytes(), created_at),
+                    )
+        return embedding
+
+    def _remember(self, key, embedding, created_at):
+        self.memory[key] = (embedding, created_at)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def get_or_create(self, text, model, create, dimensions=None):
+        """
+        Devolver el embedding en caché o calcularlo con `create(text)` y guardarlo.
+        """
+        embedding = self.get(text, model, dimensions)
+        if embedding is None:
+            embedding = self.put(text, model, create(text), dimensions)
+        return embedding
+
+    async def get_or_create_async(self, text, model, create, dimensions=None):
+        """
+        Igual que `get_or_create`, pero con una función `create` asíncrona.
+        """
+        embedding = self.get(text, model, dimensions)
+        if embedding is None:
+            embedding = self.put(text, model, await create(text), dimensions)
+        return embedding
+
+    def stats(self):
+        """
+        Contadores de aciertos (totales y desde disco), fallos y tasa de aciertos.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.memory),
+        }
@@ -0,0 +1,128 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+# Variable de entorno con el instante (time.time()) en que se lanzó el script perfilado;
+# si está definida, openai_clients registra cada respuesta de la API en stderr
+PROFILE_VARIABLE = "STARTUP_PROFILE"
+PROFILE_PREFIX = "startup-profile:"
+IMPORT_TIME_PATTERN = re.compile(r"^import time:\s+(\d+) \|\s+\d+ \| *(\S+)$")
+
+
+def response_hooks(asynchronous=False):
+    """
+    Event hooks de httpx que escriben en stderr la ruta de cada respuesta y los milisegundos
+    transcurridos desde el arranque del proceso. httpx los llama al recibir los encabezados,
+    antes de leer el cuerpo: en las respuestas en streaming es el tiempo hasta el primer token.
+    """
+    started = float(os.environ[PROFILE_VARIABLE])
+
+    def log_response(response):
+        elapsed_ms = (time.time() - started) * 1000
+        print(f"{PROFILE_PREFIX} {response.request.url.path} {elapsed_ms:.1f}", file=sys.stderr, flush=True)
+
+    async def log_response_async(response):
+        log_response(response)
+
+    return {"response": [log_response_async if asynchronous else log_response]}
+
+
+def import_breakdown(import_lines, top=15):
+    """
+    Resumir la salida de `python -X importtime` por paquete de primer nivel (sumando el tiempo propio
+    de cada módulo) y devolver el total y los `top` paquetes más lentos, en milisegundos.
+    """
+    by_package = defaultdict(int)
+    for line in import_lines:
+        match = IMPORT_TIME_PATTERN.match(line)
+        if match:
+            by_package[match.group(2).split(".")[0]] += int(match.group(1))
+    packages = sorted(by_package.items(), key=lambda item: item[1], reverse=True)
+    return {
+        "total_ms": sum(by_package.values()) / 1000,
+        "packages": [{"package": package, "ms": microseconds / 1000} for package, microseconds in packages[:top]],
+    }
+
+
+def profile_script(script, script_args=(), top=15):
+    """
+    Ejecutar el script con `-X importtime` y devolver el reporte de arranque: desglose de importaciones,
+    tiempo hasta cada primera respuesta de la API (por ruta) y tiempo total, en milisegundos desde el lanzamiento.
+    La salida estándar y la entrada del script no se tocan; stderr se filtra y se reenvía.
+    """
+    started = time.time()
+    process = subprocess.Popen(
+        [sys.executable, "-X", "importtime", script, *script_args],
+        stderr=subprocess.PIPE,
+        text=True,
+        env={**os.environ, PROFILE_VARIABLE: repr(started)},
+    )
+    import_lines = []
+    first_responses = {}
+    for line in process.stderr:
+        if line.startswith("import time:"):
+            import_lines.append(line.rstrip("\n"))
+        elif line.startswith(PROFILE_PREFIX):
+            path, elapsed_ms = line[len(PROFILE_PREFIX) :].split()
+            first_responses.setdefault(path, float(elapsed_ms))
+        else:
+            sys.stderr.write(line)
+    returncode = process.wait()
+    return {
+        "script": script,
+        "returncode": returncode,
+        "imports": import_breakdown(import_lines, top),
+        "first_responses_ms": first_responses,
+        "time_to_first_token_ms": next(
+            (elapsed_ms for path, elapsed_ms in first_responses.items() if path.endswith("/chat/completions")), None
+        ),
+        "total_ms": (time.time() - started) * 1000,
+    }
+
+
+def print_report(report):
+    print(f"\nArranque de {report['script']}:", file=sys.stderr)
+    print(f"  Importaciones: {report['imports']['total_ms']:.0f} ms", file=sys.stderr)
+    for package in report["imports"]["packages"]:
+        print(f"    {package['package']:<28} {package['ms']:>8.1f} ms", file=sys.stderr)
+    for path, elapsed_ms in report["first_responses_ms"].items():
+        print(f"  Primera respuesta de {path}: {elapsed_ms:.0f} ms", file=sys.stderr)
+    if report["time_to_first_token_ms"] is not None:
+        print(f"  Tiempo hasta el primer token: {report['time_to_first_token_ms']:.0f} ms", file=sys.stderr)
+    print(f"  Tiempo total: {report['total_ms']:.0f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Medir el arranque de un script: tiempo de importaciones y tiempo hasta el primer token.",
+        usage="python -m llm_common.startup_profiler [--top N] [--budget-ms MS] [--output ARCHIVO] script "
+        "[-- argumentos del script]",
+    )
+    parser.add_argument("script")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        help="Falla (código 1) si el tiempo hasta el primer token (o el de importaciones, sin chat) lo supera",
+    )
+    parser.add_argument("--output", help="Guardar el reporte en un archivo JSON")
+    # Lo que va después de "--" es del script perfilado; lo anterior (antes o después del script) es del perfilador
+    argv = sys.argv[1:]
+    separator = argv.index("--") if "--" in argv else len(argv)
+    args = parser.parse_args(argv[:separator])
+
+    report = profile_script(args.script, argv[separator + 1 :], top=args.top)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    measured_ms = report["time_to_first_token_ms"] or report["imports"]["total_ms"]
+    if args.budget_ms is not None and measured_ms > args.budget_ms:
+        print(f"Presupuesto de arranque superado: {measured_ms:.0f} ms > {args.budget_ms:.0f} ms", file=sys.stderr)
+        sys.exit(1)
+    sys.exit(report["returncode"])
@@ -0,0 +1,297 @@
+import argparse
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+# Extensión del archivo binario de vectores según el tipo de dato
+VECTOR_FILE_SUFFIXES = {"float32": ".f32", "float16": ".f16"}
+
+
+class VectorStore:
+    """
+    Almacén de vectores respaldado por NumPy.
+    Los embeddings se guardan como una matriz contigua ya normalizada (en memoria,
+    o mapeada desde disco con `load`), así que la similitud del coseno se reduce
+    a un producto matriz-vector.
+    Con `dimensions`, la búsqueda usa sólo el prefijo de cada vector (embeddings Matryoshka,
+    como text-embedding-3) para una primera pasada rápida y vuelve a ordenar los mejores
+    candidatos con el vector completo, sin guardar una segunda copia de los embeddings.
+    """
+
+    def __init__(self, documents, embeddings, normalized=False):
+        self.documents = documents
+        # Normas de los prefijos por número de dimensiones, calculadas al primer uso
+        self.prefix_norms = {}
+        # Huella del almacén en disco (sólo si se abrió con `load`)
+        self.fingerprint = None
+        self.documents_by_id = {doc["id"]: doc for doc in documents}
+        if normalized and embeddings.dtype == np.float32:
+            # Ya normalizados (p. ej. un np.memmap): no los copiamos a memoria
+            self.embeddings = embeddings
+        elif normalized:
+            # float16 es sólo formato de almacenamiento: NumPy no multiplica matrices float16 con BLAS,
+            # así que se convierten a float32 una vez aquí y no en cada consulta
+            self.embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        else:
+            self.embeddings = normalize(np.ascontiguousarray(embeddings, dtype=np.float32))
+
+    @classmethod
+    def from_json(cls, path):
+        """
+        Cargar los fragmentos ingeridos (id, texto y embedding) desde un archivo JSON.
+        """
+        with open(path) as file:
+            chunks = json.load(file)
+        embeddings = np.array([chunk.pop("embedding") for chunk in chunks], dtype=np.float32)
+        return cls(chunks, embeddings)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Abrir un almacén binario escrito por `save`. Los textos e ids se leen del
+        archivo sidecar y los vectores se mapean en memoria con `np.memmap`,
+        así que sólo se leen del disco las páginas que realmente se usan.
+        Los vectores float16 ocupan la mitad en disco, pero se cargan completos en memoria como float32.
+        """
+        metadata_path = metadata_path_for(path)
+        with open(metadata_path, encoding="utf-8") as file:
+            metadata = json.load(file)
+        vectors_path = metadata_path.with_name(metadata["vectors_file"])
+        if metadata["count"] == 0:
+            # Un archivo vacío no se puede mapear en memoria
+            embeddings = np.empty((0, metadata["dimensions"]), dtype=np.float32)
+        else:
+            embeddings = np.memmap(
+                vectors_path,
+                dtype=metadata["dtype"],
+                mode="r",
+                shape=(metadata["count"], metadata["dimensions"]),
+            )
+        store = cls(metadata["documents"], embeddings, normalized=True)
+        store.fingerprint = storage_fingerprint(metadata, metadata_path, vectors_path)
+        return store
+
+    def save(self, path, dtype="float32"):
+        """
+        Guardar el almacén en formato binario: un archivo sidecar JSON compacto con
+        los ids y textos, y un archivo con los vectores normalizados en crudo.
+        """
+        save_binary(path, self.documents, self.embeddings, dtype=dtype, normalized=True)
+
+    def __len__(self):
+        return len(self.documents)
+
+    def search(self, query_embedding, limit, dimensions=None, rescore_factor=4):
+        """
+        Devolver los `limit` documentos más similares al embedding de la consulta,
+        como una lista de tuplas (documento, similitud) ordenadas de mayor a menor.
+        Con `dimensions`, primero se buscan `limit * rescore_factor` candidatos usando sólo
+        esas primeras dimensiones y luego se reordenan con todas (`rescore_factor=0` no reordena).
+        """
+        return self.search_batch([query_embedding], limit, dimensions, rescore_factor)[0]
+
+    def search_batch(self, query_embeddings, limit, dimensions=None, rescore_factor=4):
+        """
+        Buscar varias consultas a la vez con un solo producto de matrices.
+        Devuelve una lista de resultados por consulta, igual que `search`.
+        """
+        queries = normalize(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        if len(self) == 0:
+            return [[] for _ in queries]
+        if dimensions is None or dimensions >= self.embeddings.shape[1]:
+            similarities = queries @ self.embeddings.T
+            indices = top_k_indices(similarities, limit)
+            similarities = np.take_along_axis(similarities, indices, axis=-1)
+        else:
+            indices, similarities = self.prefix_search(queries, limit, dimensions, rescore_factor)
+        return [
+            [(self.documents[i], float(similarity)) for i, similarity in zip(row_indices, row_similarities)]
+            for row_indices, row_similarities in zip(indices.tolist(), similarities.tolist())
+        ]
+
+    def prefix_search(self, queries, limit, dimensions, rescore_factor):
+        """
+        Búsqueda gruesa con las primeras `dimensions` dimensiones renormalizadas y,
+        si `rescore_factor`, reordenamiento de los candidatos con los vectores completos.
+        Devuelve los índices y similitudes de cada consulta.
+        """
+        if dimensions not in self.prefix_norms:
+            norms = np.linalg.norm(self.embeddings[:, :dimensions], axis=1)
+            norms[norms == 0] = 1
+            self.prefix_norms[dimensions] = norms.astype(np.float32)
+        coarse_queries = normalize(queries[:, :dimensions])
+        coarse = (coarse_queries @ self.embeddings[:, :dimensions].T) / self.prefix_norms[dimensions]
+        if not rescore_factor:
+            indices = top_k_indices(coarse, limit)
+            return indices, np.take_along_axis(coarse, indices, axis=-1)
+        candidates = top_k_indices(coarse, limit * rescore_factor)
+        exact = np.einsum("qd,qcd->qc", queries, np.asarray(self.embeddings[candidates], dtype=np.float32))
+        order = top_k_indices(exact, limit)
+        return np.take_along_axis(candidates, order, axis=-1), np.take_along_axis(exact, order, axis=-1)
+
+
+def metadata_path_for(path):
+    """
+    Ruta del archivo sidecar para un almacén binario, p. ej.
+    `rag_ingested_chunks` -> `rag_ingested_chunks.meta.json`.
+    """
+    path = Path(path)
+    if path.name.endswith(".meta.json"):
+        return path
+    return path.with_name(f"{path.stem if path.suffix == '.json' else path.name}.meta.json")
+
+
+def storage_fingerprint(metadata, metadata_path, vectors_path):
+    """
+    Huella barata de un almacén binario: número de vectores, dimensiones, tipo de dato y tamaño
+    y fecha de modificación de sus dos archivos, sin leer los vectores.
+    `BinaryStoreWriter` reemplaza ambos archivos al escribir, así que cualquier cambio la altera.
+    """
+    stats = [os.stat(file_path) for file_path in (metadata_path, vectors_path)]
+    key = [metadata["count"], metadata["dimensions"], metadata["dtype"], [[st.st_size, st.st_mtime_ns] for st in stats]]
+    return hashlib.sha256(json.dumps(key).encode("utf-8")).hexdigest()
+
+
+def save_binary(path, documents, embeddings, dtype="float32", normalized=False):
+    """
+    Escribir documentos (sin embedding) y sus vectores en formato binario.
+    """
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    if not normalized:
+        vectors = normalize(vectors)
+    with BinaryStoreWriter(path, dtype=dtype) as writer:
+        writer.append(documents, vectors, normalized=True)
+
+
+class BinaryStoreWriter:
+    """
+    Escritor incremental del formato binario: los vectores se añaden al archivo
+    a medida que llegan (abriéndolo sólo durante cada `append`) y el sidecar se
+    escribe al cerrar, así que nunca hace falta tener todos los embeddings en memoria a la vez.
+    Ambos archivos se escriben a rutas temporales y sólo reemplazan al almacén
+    existente al cerrar sin errores; si el bloque `with` falla, se descartan.
+    """
+
+    def __init__(self, path, dtype="float32"):
+        if dtype not in VECTOR_FILE_SUFFIXES:
+            raise ValueError(f"Tipo de dato no soportado: {dtype}. Usa uno de {list(VECTOR_FILE_SUFFIXES)}")
+        self.dtype = dtype
+        self.metadata_path = metadata_path_for(path)
+        self.vectors_path = self.metadata_path.with_name(
+            self.metadata_path.name.removesuffix(".meta.json") + VECTOR_FILE_SUFFIXES[dtype]
+        )
+        self.temp_suffix = f".{os.getpid()}.tmp"
+        self.temp_vectors_path = f"{self.vectors_path}{self.temp_suffix}"
+        with open(self.temp_vectors_path, "wb"):
+            pass
+        self.closed = False
+        self.documents = []
+        self.dimensions = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def append(self, documents, embeddings, normalized=False):
+        """
+        Añadir documentos y sus vectores al final del almacén.
+        """
+        vectors = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        if len(documents) == 0:
+            return
+        if self.dimensions is None:
+            self.dimensions = vectors.shape[1]
+        elif vectors.shape[1] != self.dimensions:
+            raise ValueError(f"Se esperaban vectores de {self.dimensions} dimensiones, no {vectors.shape[1]}")
+        if not normalized:
+            vectors = normalize(vectors)
+        with open(self.temp_vectors_path, "ab") as file:
+            vectors.astype(self.dtype).tofile(file)
+        self.documents.extend({key: value for key, value in doc.items() if key != "embedding"} for doc in documents)
+
+    def close(self):
+        """
+        Cerrar el archivo de vectores, escribir el sidecar con los documentos
+        y reemplazar con ambos el almacén existente. Si el almacén anterior usaba
+        otro tipo de dato, su archivo de vectores se borra.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        metadata = {
+            "count": len(self.documents),
+            "dimensions": self.dimensions or 0,
+            "dtype": self.dtype,
+            "vectors_file": self.vectors_path.name,
+            "documents": self.documents,
+        }
+        with open(f"{self.metadata_path}{self.temp_suffix}", "w", encoding="utf-8") as file:
+            json.dump(metadata, file, ensure_ascii=False)
+        # El sidecar se reemplaza al final: hasta entonces describe a los vectores anteriores
+        os.replace(self.temp_vectors_path, self.vectors_path)
+        os.replace(f"{self.metadata_path}{self.temp_suffix}", self.metadata_path)
+        for suffix in VECTOR_FILE_SUFFIXES.values():
+            stale_path = self.vectors_path.with_suffix(suffix)
+            if stale_path != self.vectors_path:
+                stale_path.unlink(missing_ok=True)
+
+    def discard(self):
+        """
+        Borrar el archivo temporal de vectores sin tocar el almacén existente.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        os.remove(self.temp_vectors_path)
+
+
+def convert_json(json_path, dtype="float32"):
+    """
+    Convertir un archivo JSON de fragmentos ingeridos al formato binario,
+    escribiendo los archivos junto al JSON original.
+    """
+    store = VectorStore.from_json(json_path)
+    store.save(json_path, dtype=dtype)
+    return metadata_path_for(json_path)
+
+
+def normalize(vectors):
+    """
+    Normalizar cada fila a norma 1, dejando intactas las filas nulas.
+    """
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def top_k_indices(scores, k):
+    """
+    Índices de los `k` mayores puntajes de cada fila, ordenados de mayor a menor.
+    Usa `argpartition` para no ordenar todos los puntajes.
+    """
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.intp)
+    if k < scores.shape[-1]:
+        candidates = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    else:
+        candidates = np.broadcast_to(np.arange(scores.shape[-1]), scores.shape)
+    candidate_scores = np.take_along_axis(scores, candidates, axis=-1)
+    order = np.argsort(-candidate_scores, axis=-1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=-1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convertir fragmentos ingeridos en JSON al formato binario.")
+    parser.add_argument("json_path", nargs="?", default="rag_ingested_chunks.json")
+    parser.add_argument("--dtype", choices=list(VECTOR_FILE_SUFFIXES), default="float32")
+    args = parser.parse_args()
+    print(f"Escrito {convert_json(args.json_path, dtype=args.dtype)}")
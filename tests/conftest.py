@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from llm_common.vector_store import normalize
+
+
+@pytest.fixture
+def corpus():
+    """
+    Vectores agrupados alrededor de 20 centros (como embeddings de temas parecidos), consultas cercanas
+    a algunos de ellos y los 10 vecinos exactos de cada consulta por similitud del coseno.
+    """
+    rng = np.random.default_rng(42)
+    centers = rng.standard_normal((20, 64))
+    vectors = (centers[rng.integers(0, 20, 1000)] + 0.5 * rng.standard_normal((1000, 64))).astype(np.float32)
+    queries = (vectors[rng.choice(1000, 50, replace=False)] + 0.1 * rng.standard_normal((50, 64))).astype(np.float32)
+    documents = [{"id": str(i), "text": f"documento {i}"} for i in range(len(vectors))]
+    exact = np.argsort(-(normalize(queries) @ normalize(vectors).T), axis=1, kind="stable")[:, :10]
+    return documents, vectors, queries, exact
+
+
+@pytest.fixture
+def recall_at_k():
+    """
+    Fracción de los vecinos exactos que aparecen en los resultados, promediada sobre las consultas.
+    """
+
+    def recall(results_per_query, exact):
+        hits = [
+            len({int(doc["id"]) for doc, _ in results} & set(row.tolist())) / len(row)
+            for results, row in zip(results_per_query, exact)
+        ]
+        return float(np.mean(hits))
+
+    return recall
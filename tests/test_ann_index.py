@@ -0,0 +1,50 @@
+import pytest
+
+pytest.importorskip("hnswlib")
+
+from ann_index import ANNIndex, fingerprint
+
+
+def test_ann_index_recall(corpus, recall_at_k):
+    documents, vectors, queries, exact = corpus
+    index = ANNIndex.build(documents, vectors)
+    assert recall_at_k(index.search_batch(queries, 10), exact) >= 0.95
+
+
+def test_search_keeps_ef(corpus):
+    documents, vectors, queries, _ = corpus
+    index = ANNIndex.build(documents, vectors, ef=5)
+    assert len(index.search(queries[0], 20)) == 20
+    assert index.ef == 5
+
+
+def test_deleted_slots_are_reused_before_resizing(corpus):
+    documents, vectors, _, _ = corpus
+    index = ANNIndex.build(documents[:100], vectors[:100])
+    index.delete(["0", "1"])
+    index.add(documents[100:101], vectors[100:101])
+    assert index.max_elements == 100
+    assert len(index) == 99
+    assert {"0", "1"}.isdisjoint(doc["id"] for doc, _ in index.search(vectors[0], 99))
+
+
+def test_replacing_an_id_keeps_one_copy(corpus):
+    documents, vectors, _, _ = corpus
+    index = ANNIndex.build(documents[:10], vectors[:10])
+    index.add([documents[3]], vectors[50:51])
+    assert len(index) == 10
+    doc, similarity = index.search(vectors[50], 1)[0]
+    assert doc["id"] == "3"
+    assert similarity == pytest.approx(1, abs=1e-5)
+
+
+def test_load_or_build_round_trip(tmp_path, corpus):
+    documents, vectors, queries, _ = corpus
+    path = tmp_path / "chunks.hnsw"
+    built = ANNIndex.load_or_build(documents, vectors, path)
+    loaded = ANNIndex.load(path)
+    assert len(loaded) == len(built)
+    assert loaded.search(queries[0], 10) == built.search(queries[0], 10)
+    changed = vectors.copy()
+    changed[0] = -changed[0]
+    assert ANNIndex.load(path, fingerprint(documents, changed)) is None
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from bm25 import BM25Index, analyze
+
+WORDS = [
+    "motor", "bateria", "hibrido", "consumo", "autonomia", "precio", "electrico", "ciudad", "carretera", "potencia",
+    "freno", "regenerativo", "modelo", "marca", "litros", "kilometros", "emisiones", "carga", "enchufable", "sedan",
+]
+
+
+@pytest.fixture
+def documents():
+    rng = np.random.default_rng(7)
+    # Frecuencias de Zipf: pocas palabras muy comunes y muchas raras, como en un texto real
+    weights = 1 / np.arange(1, len(WORDS) + 1)
+    weights /= weights.sum()
+    return [
+        {"id": str(i), "texto": " ".join(rng.choice(WORDS, size=rng.integers(3, 30), p=weights))} for i in range(300)
+    ]
+
+
+def test_analyze_folds_accents_and_drops_stopwords():
+    assert analyze("La batería del híbrido") == analyze("bateria hibrido")
+
+
+@pytest.mark.parametrize("query", ["motor", "bateria consumo", "freno regenerativo sedan", "emisiones carga litros"])
+@pytest.mark.parametrize("limit", [1, 5, 20])
+def test_pruned_search_matches_exhaustive_search(documents, query, limit):
+    index = BM25Index.build(documents, "id", ["texto"])
+    exhaustive = index.search(query)
+    pruned = index.search(query, limit=limit)
+    assert len(pruned) == min(limit, len(exhaustive))
+    np.testing.assert_allclose(
+        [result["score"] for result in pruned], [result["score"] for result in exhaustive[:limit]], rtol=1e-6
+    )
+
+
+def test_unknown_terms_return_nothing(documents):
+    assert BM25Index.build(documents, "id", ["texto"]).search("tractor") == []
+
+
+def test_save_and_load_round_trip(tmp_path, documents):
+    index = BM25Index.build(documents, "id", ["texto"])
+    path = tmp_path / "bm25.npz"
+    index.save(path, source_fingerprint="abc")
+    assert BM25Index.load(path, source_fingerprint="otra") is None
+    loaded = BM25Index.load(path, source_fingerprint="abc")
+    assert loaded.search("bateria consumo", limit=5) == index.search("bateria consumo", limit=5)
+
+
+def test_load_or_build_rebuilds_when_documents_change(tmp_path, documents):
+    path = tmp_path / "bm25.npz"
+    BM25Index.load_or_build(documents, "id", ["texto"], path)
+    changed = [*documents[:-1], {"id": "nuevo", "texto": "tractor diesel"}]
+    assert BM25Index.load_or_build(changed, "id", ["texto"], path).search("tractor")[0]["ref"] == "nuevo"
@@ -0,0 +1,36 @@
+from ingestion_checkpoint import IngestionCheckpoint
+
+
+def make_chunks(filename, count):
+    return [{"id": f"{filename}-{i}", "text": f"fragmento {i}", "embedding": [i, i + 0.5]} for i in range(count)]
+
+
+def test_append_and_reopen_round_trip(tmp_path):
+    path = tmp_path / "ingestion.jsonl"
+    checkpoint = IngestionCheckpoint(path)
+    checkpoint.append_file("a.pdf", make_chunks("a.pdf", 3))
+    checkpoint.append_file("b.pdf", make_chunks("b.pdf", 2))
+    reopened = IngestionCheckpoint(path)
+    assert reopened.completed_files == {"a.pdf", "b.pdf"}
+    assert list(reopened.iter_chunks()) == make_chunks("a.pdf", 3) + make_chunks("b.pdf", 2)
+
+
+def test_recover_discards_unfinished_file(tmp_path):
+    path = tmp_path / "ingestion.jsonl"
+    IngestionCheckpoint(path).append_file("a.pdf", make_chunks("a.pdf", 2))
+    with open(path, "a", encoding="utf-8") as file:
+        # Un fragmento completo de b.pdf y otro cortado a la mitad, sin la línea de completado
+        file.write('{"id": "b.pdf-0", "text": "fragmento 0", "embedding": [0, 0.5]}\n{"id": "b.pdf-1", "te')
+    checkpoint = IngestionCheckpoint(path)
+    assert checkpoint.completed_files == {"a.pdf"}
+    assert list(checkpoint.iter_chunks()) == make_chunks("a.pdf", 2)
+    checkpoint.append_file("b.pdf", make_chunks("b.pdf", 2))
+    assert list(IngestionCheckpoint(path).iter_chunks()) == make_chunks("a.pdf", 2) + make_chunks("b.pdf", 2)
+
+
+def test_remove(tmp_path):
+    checkpoint = IngestionCheckpoint(tmp_path / "ingestion.jsonl")
+    checkpoint.append_file("a.pdf", make_chunks("a.pdf", 1))
+    checkpoint.remove()
+    assert not (tmp_path / "ingestion.jsonl").exists()
+    assert IngestionCheckpoint(tmp_path / "ingestion.jsonl").completed_files == set()
@@ -0,0 +1,17 @@
+import numpy as np
+
+from llm_common.neighbors import blocked_top_k
+from llm_common.vector_store import normalize
+
+
+def test_blocked_top_k_matches_full_matrix(corpus):
+    _, vectors, _, _ = corpus
+    vectors = normalize(vectors)
+    similarities = vectors @ vectors.T
+    np.fill_diagonal(similarities, -np.inf)
+    expected = np.sort(similarities, axis=1)[:, ::-1][:, :5]
+    # Bloques que no dividen al total, para cubrir el último bloque incompleto
+    indices, found = blocked_top_k(vectors, 5, block_size=300)
+    np.testing.assert_allclose(found, expected, atol=1e-6)
+    np.testing.assert_allclose(np.take_along_axis(similarities, indices, axis=1), found, atol=1e-6)
+    assert not np.any(indices == np.arange(len(vectors))[:, None])
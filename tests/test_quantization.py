@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from llm_common.quantization import BinaryIndex, Int8Index, ScalarQuantizer, popcount
+from llm_common.vector_store import normalize
+
+
+def test_scalar_quantizer_error_is_half_a_level(corpus):
+    _, vectors, _, _ = corpus
+    vectors = normalize(vectors)
+    quantizer = ScalarQuantizer.fit(vectors)
+    decoded = quantizer.decode(quantizer.encode(vectors))
+    assert np.all(np.abs(decoded - vectors) <= quantizer.scales / 2 + 1e-6)
+
+
+def test_popcount_counts_bits():
+    values = np.array([0, 1, 0xFF, 2**64 - 1, 0b1011 << 40], dtype=np.uint64)
+    assert np.asarray(popcount(values)).tolist() == [0, 1, 8, 64, 3]
+
+
+def test_int8_index_recall(corpus, recall_at_k):
+    documents, vectors, queries, exact = corpus
+    index = Int8Index.from_vectors(documents, vectors)
+    assert recall_at_k(index.search_batch(queries, 10), exact) >= 0.95
+
+
+def test_binary_index_rescoring_recovers_recall(corpus, recall_at_k):
+    documents, vectors, queries, exact = corpus
+    coarse = BinaryIndex.from_vectors(documents, vectors)
+    rescored = BinaryIndex.from_vectors(documents, vectors, keep_vectors=True, rescore_factor=4)
+    assert recall_at_k(rescored.search_batch(queries, 10), exact) >= 0.85
+    assert recall_at_k(rescored.search_batch(queries, 10), exact) > recall_at_k(coarse.search_batch(queries, 10), exact)
+
+
+def test_binary_index_rescoring_every_candidate_is_exact(corpus):
+    documents, vectors, queries, exact = corpus
+    index = BinaryIndex.from_vectors(documents, vectors, keep_vectors=True, rescore_factor=len(documents) // 10)
+    results = index.search_batch(queries, 10)
+    # Vecinos casi empatados pueden cambiar de orden por el redondeo: se comparan conjuntos y similitudes
+    assert [{int(doc["id"]) for doc, _ in row} for row in results] == [set(row) for row in exact.tolist()]
+    expected = np.sort(normalize(queries) @ normalize(vectors).T, axis=1)[:, ::-1][:, :10]
+    np.testing.assert_allclose([[score for _, score in row] for row in results], expected, atol=1e-5)
+
+
+@pytest.mark.parametrize("index_class", [Int8Index, BinaryIndex])
+def test_quantized_index_uses_less_memory(corpus, index_class):
+    documents, vectors, _, _ = corpus
+    index = index_class.from_vectors(documents, vectors)
+    assert index.memory_bytes() < normalize(vectors).nbytes
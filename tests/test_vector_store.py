@@ -0,0 +1,79 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from llm_common.vector_store import BinaryStoreWriter, VectorStore, normalize
+
+
+def test_search_matches_exact_top_k(corpus):
+    documents, vectors, queries, exact = corpus
+    store = VectorStore(documents, vectors)
+    results = store.search_batch(queries, 10)
+    assert [[int(doc["id"]) for doc, _ in row] for row in results] == exact.tolist()
+    assert all(a >= b for row in results for (_, a), (_, b) in itertools.pairwise(row))
+
+
+def test_prefix_search_rescoring_every_candidate_is_exact(corpus):
+    documents, vectors, queries, exact = corpus
+    store = VectorStore(documents, vectors)
+    # Con tantos candidatos como documentos, el reordenamiento con el vector completo es la búsqueda exacta
+    results = store.search_batch(queries, 10, dimensions=16, rescore_factor=len(documents) // 10)
+    assert [[int(doc["id"]) for doc, _ in row] for row in results] == exact.tolist()
+
+
+def test_prefix_search_with_rescoring_keeps_recall(corpus, recall_at_k):
+    documents, vectors, queries, exact = corpus
+    store = VectorStore(documents, vectors)
+    coarse = store.search_batch(queries, 10, dimensions=16, rescore_factor=0)
+    rescored = store.search_batch(queries, 10, dimensions=16, rescore_factor=8)
+    assert recall_at_k(rescored, exact) >= recall_at_k(coarse, exact)
+    assert recall_at_k(rescored, exact) >= 0.9
+
+
+@pytest.mark.parametrize(("dtype", "tolerance"), [("float32", 1e-6), ("float16", 1e-3)])
+def test_binary_store_round_trip(tmp_path, corpus, dtype, tolerance):
+    documents, vectors, queries, exact = corpus
+    VectorStore(documents, vectors).save(tmp_path / "chunks", dtype=dtype)
+    store = VectorStore.load(tmp_path / "chunks")
+    assert store.documents == documents
+    assert store.embeddings.dtype == np.float32
+    np.testing.assert_allclose(store.embeddings, normalize(vectors), atol=tolerance)
+    assert store.fingerprint is not None
+    assert [int(doc["id"]) for doc, _ in store.search(queries[0], 10)][:3] == exact[0, :3].tolist()
+
+
+def test_writer_appends_in_batches(tmp_path, corpus):
+    documents, vectors, _, _ = corpus
+    with BinaryStoreWriter(tmp_path / "chunks") as writer:
+        for start in range(0, len(documents), 300):
+            writer.append(documents[start : start + 300], vectors[start : start + 300])
+    store = VectorStore.load(tmp_path / "chunks")
+    assert len(store) == len(documents)
+    np.testing.assert_allclose(store.embeddings, normalize(vectors), atol=1e-6)
+
+
+def test_failed_write_keeps_previous_store(tmp_path, corpus):
+    documents, vectors, _, _ = corpus
+    VectorStore(documents[:10], vectors[:10]).save(tmp_path / "chunks")
+    with pytest.raises(RuntimeError), BinaryStoreWriter(tmp_path / "chunks") as writer:
+        writer.append(documents[10:20], vectors[10:20])
+        raise RuntimeError("falla durante la ingesta")
+    assert VectorStore.load(tmp_path / "chunks").documents == documents[:10]
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["chunks.f32", "chunks.meta.json"]
+
+
+def test_empty_store_loads(tmp_path):
+    with BinaryStoreWriter(tmp_path / "chunks"):
+        pass
+    store = VectorStore.load(tmp_path / "chunks")
+    assert len(store) == 0
+    assert store.search(np.ones(8), 5) == []
+
+
+def test_save_removes_vectors_of_other_dtype(tmp_path, corpus):
+    documents, vectors, _, _ = corpus
+    store = VectorStore(documents[:10], vectors[:10])
+    store.save(tmp_path / "chunks", dtype="float16")
+    store.save(tmp_path / "chunks", dtype="float32")
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["chunks.f32", "chunks.meta.json"]
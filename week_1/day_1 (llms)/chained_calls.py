@@ -1,75 +1,77 @@
-import os
+import argparse
+import asyncio
+from pathlib import Path
 
-import azure.identity
-import openai
 from dotenv import load_dotenv
 
-# Configura el cliente de OpenAI para usar la API de Azure, OpenAI.com u Ollama
+from llm_common.llm_pipeline import Pipeline, Step
+from llm_common.openai_clients import get_client, get_host, get_model_name
+
+# Configura el cliente asíncrono de OpenAI para usar la API de Azure, OpenAI.com u Ollama
 load_dotenv(override=True)
-API_HOST = os.getenv("API_HOST", "github")
+API_HOST = get_host()
+client = get_client(API_HOST, asynchronous=True)
+MODEL_NAME = get_model_name(API_HOST)
 
-if API_HOST == "azure":
-    token_provider = azure.identity.get_bearer_token_provider(
-        azure.identity.DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default"
-    )
-    client = openai.OpenAI(
-        base_url=os.environ["AZURE_OPENAI_ENDPOINT"],
-        api_key=token_provider,
-    )
-    MODEL_NAME = os.environ["AZURE_OPENAI_CHAT_DEPLOYMENT"]
+parser = argparse.ArgumentParser(description="Explicar, revisar y reescribir uno o muchos temas.")
+parser.add_argument("--topics", help="Archivo con un tema por línea (por defecto, sólo 'cómo funcionan los LLM')")
+parser.add_argument("--max-concurrency", type=int, default=8)
+args = parser.parse_args()
 
-elif API_HOST == "ollama":
-    client = openai.OpenAI(base_url=os.environ["OLLAMA_ENDPOINT"], api_key="nokeyneeded")
-    MODEL_NAME = os.environ["OLLAMA_MODEL"]
+# La cadena como grafo: las dos revisiones sólo usan la explicación, así que se piden a la vez,
+# y el artículo final espera a ambas
+pipeline = Pipeline(
+    client,
+    MODEL_NAME,
+    [
+        Step("explanation", "Explica {input} en un solo párrafo."),
+        Step(
+            "feedback",
+            "Eres un editor. Revisa la explicación y proporciona comentarios detallados sobre claridad, coherencia "
+            "y cautivación (pero no la edites tú mismo):\n\n{explanation}",
+        ),
+        Step(
+            "technical_review",
+            "Eres un experto en aprendizaje automático. Señala las imprecisiones técnicas de la explicación "
+            "(pero no la edites tú mismo):\n\n{explanation}",
+        ),
+        Step(
+            "final_article",
+            "Revisa el artículo utilizando los siguientes comentarios, pero mantenlo a un solo párrafo."
+            "\nExplicación:\n{explanation}\n\nComentarios:\n{feedback}\n\n{technical_review}",
+        ),
+    ],
+    max_concurrency=args.max_concurrency,
+)
 
-elif API_HOST == "github":
-    client = openai.OpenAI(base_url="https://models.github.ai/inference", api_key=os.environ["GITHUB_TOKEN"])
-    MODEL_NAME = os.getenv("GITHUB_MODEL", "openai/gpt-4o")
+LABELS = {"explanation": "Explicación", "feedback": "Retroalimentación", "technical_review": "Revisión técnica"}
 
-else:
-    client = openai.OpenAI(api_key=os.environ["OPENAI_KEY"])
-    MODEL_NAME = os.environ["OPENAI_MODEL"]
 
+async def explain_one(topic):
+    # Los pasos intermedios se muestran al terminar y el artículo final token a token
+    streaming = False
 
-response = client.chat.completions.create(
-    model=MODEL_NAME,
-    temperature=0.7,
-    messages=[{"role": "user", "content": "Explica cómo funcionan los LLM en un solo párrafo."}],
-)
+    def print_token(token):
+        nonlocal streaming
+        if not streaming:
+            print("Final Article: ", end="")
+            streaming = True
+        print(token, end="", flush=True)
 
-explanation = response.choices[0].message.content
-print("Explicación: ", explanation)
-response = client.chat.completions.create(
-    model=MODEL_NAME,
-    temperature=0.7,
-    messages=[
-        {
-            "role": "user",
-            "content": (
-                "Eres un editor. Revisa la explicación y proporciona comentarios detallados sobre claridad, coherencia "
-                "y cautivación (pero no la edites tú mismo):\n\n"
-            )
-            + explanation,
-        }
-    ],
-)
+    await pipeline.run(topic, on_step=lambda name, text: print(f"{LABELS[name]}: {text}\n\n"), on_token=print_token)
+    print()
 
-feedback = response.choices[0].message.content
-print("\n\nRetroalimentación: ", feedback)
 
-response = client.chat.completions.create(
-    model=MODEL_NAME,
-    temperature=0.7,
-    messages=[
-        {
-            "role": "user",
-            "content": (
-                "Revisa el artículo utilizando los siguientes comentarios, pero mantenlo a un solo párrafo."
-                f"\nExplicación:\n{explanation}\n\nComentarios:\n{feedback}"
-            ),
-        }
-    ],
-)
+async def explain_many(topics):
+    async for index, results in pipeline.run_many(topics):
+        if isinstance(results, Exception):
+            print(f"[{index + 1}/{len(topics)}] {topics[index]}: error {results}")
+        else:
+            print(f"[{index + 1}/{len(topics)}] {topics[index]}:\n{results['final_article']}\n")
 
-final_article = response.choices[0].message.content
-print("\n\nFinal Article: ", final_article)
\ No newline at end of file
+
+if args.topics:
+    topics = [line.strip() for line in Path(args.topics).read_text(encoding="utf-8").splitlines() if line.strip()]
+    asyncio.run(explain_many(topics))
+else:
+    asyncio.run(explain_one("cómo funcionan los LLM"))
@@ -1,35 +1,12 @@
-import os
-
-import azure.identity
-import openai
 from dotenv import load_dotenv
 
+from llm_common.openai_clients import get_client, get_host, get_model_name
+
 # Configura el cliente de OpenAI para usar la API de Azure, OpenAI.com u Ollama
 load_dotenv(override=True)
-API_HOST = os.getenv("API_HOST", "github")
-
-if API_HOST == "azure":
-    token_provider = azure.identity.get_bearer_token_provider(
-        azure.identity.DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default"
-    )
-    client = openai.OpenAI(
-        base_url=os.environ["AZURE_OPENAI_ENDPOINT"],
-        api_key=token_provider,
-    )
-    MODEL_NAME = os.environ["AZURE_OPENAI_CHAT_DEPLOYMENT"]
-
-elif API_HOST == "ollama":
-    client = openai.OpenAI(base_url=os.environ["OLLAMA_ENDPOINT"], api_key="nokeyneeded")
-    MODEL_NAME = os.environ["OLLAMA_MODEL"]
-
-elif API_HOST == "github":
-    client = openai.OpenAI(base_url="https://models.github.ai/inference", api_key=os.environ["GITHUB_TOKEN"])
-    MODEL_NAME = os.getenv("GITHUB_MODEL", "openai/gpt-4o")
-
-else:
-    client = openai.OpenAI(api_key=os.environ["OPENAI_KEY"])
-    MODEL_NAME = os.environ["OPENAI_MODEL"]
-
+API_HOST = get_host()
+client = get_client(API_HOST)
+MODEL_NAME = get_model_name(API_HOST)
 
 response = client.chat.completions.create(
     model=MODEL_NAME,
@@ -0,0 +1,197 @@
+import argparse
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import hnswlib
+import numpy as np
+
+
+def fingerprint(documents, embeddings):
+    """
+    Huella de los documentos (ids) y sus vectores, para saber si un índice guardado sigue vigente.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([doc["id"] for doc in documents], ensure_ascii=False).encode("utf-8"))
+    digest.update(np.ascontiguousarray(embeddings, dtype=np.float32).tobytes())
+    return digest.hexdigest()
+
+
+class ANNIndex:
+    """
+    Índice de vecinos más cercanos aproximado (HNSW, con hnswlib) sobre documentos con "id".
+    Tiene la misma interfaz de búsqueda que `VectorStore` (listas de (documento, similitud)),
+    así que se puede usar en su lugar. La capacidad crece sola al añadir elementos,
+    los borrados son lógicos (sus lugares se reutilizan) y `ef` se ajusta sin reconstruir.
+    """
+
+    def __init__(self, dimensions, max_elements=1024, M=16, ef_construction=200, ef=50):
+        self.dimensions = dimensions
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef = ef
+        self.index = hnswlib.Index(space="cosine", dim=dimensions)
+        self.index.init_index(
+            max_elements=max_elements, ef_construction=ef_construction, M=M, allow_replace_deleted=True
+        )
+        self.index.set_ef(ef)
+        self.documents_by_label = {}
+        self.labels_by_id = {}
+        self.next_label = 0
+
+    @classmethod
+    def build(cls, documents, embeddings, **params):
+        """
+        Construir el índice con todos los documentos y sus embeddings.
+        """
+        embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        ann_index = cls(embeddings.shape[1], max_elements=max(len(documents), 1), **params)
+        ann_index.add(documents, embeddings)
+        return ann_index
+
+    def __len__(self):
+        return len(self.documents_by_label)
+
+    @property
+    def max_elements(self):
+        return self.index.get_max_elements()
+
+    def set_ef(self, ef):
+        """
+        Ajustar el equilibrio entre velocidad y exhaustividad de la búsqueda (mayor `ef`, más exhaustiva).
+        Cambia el parámetro del índice compartido: no llamarlo mientras otros hilos están buscando.
+        """
+        self.ef = ef
+        self.index.set_ef(ef)
+
+    def add(self, documents, embeddings):
+        """
+        Añadir documentos de forma incremental. Un documento con un id ya indexado reemplaza al anterior.
+        Si no hay lugar ni siquiera reutilizando los borrados, la capacidad del índice se duplica con `resize_index`.
+        """
+        embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        if len(documents) == 0:
+            return
+        self.delete([doc["id"] for doc in documents if doc["id"] in self.labels_by_id])
+        # Los lugares de los borrados se reutilizan (replace_deleted), así que sólo cuentan los documentos vigentes
+        required = len(self) + len(documents)
+        if required > self.max_elements:
+            self.index.resize_index(max(required, 2 * self.max_elements))
+        labels = np.arange(self.next_label, self.next_label + len(documents))
+        self.next_label += len(documents)
+        self.index.add_items(embeddings, labels, replace_deleted=True)
+        for label, doc in zip(labels.tolist(), documents):
+            self.documents_by_label[label] = {key: value for key, value in doc.items() if key != "embedding"}
+            self.labels_by_id[doc["id"]] = label
+
+    def delete(self, ids):
+        """
+        Borrar documentos por id: se marcan como borrados y dejan de aparecer en las búsquedas.
+        """
+        for doc_id in ids:
+            label = self.labels_by_id.pop(doc_id, None)
+            if label is not None:
+                self.index.mark_deleted(label)
+                del self.documents_by_label[label]
+
+    def search(self, query_embedding, limit):
+        """
+        Devolver los `limit` documentos más similares al embedding de la consulta,
+        como una lista de tuplas (documento, similitud) ordenadas de mayor a menor.
+        """
+        return self.search_batch([query_embedding], limit)[0]
+
+    def search_batch(self, query_embeddings, limit):
+        """
+        Buscar varias consultas a la vez. Devuelve una lista de resultados por consulta, igual que `search`.
+        """
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        limit = min(limit, len(self))
+        if limit <= 0:
+            return [[] for _ in queries]
+        # hnswlib ya busca con max(ef, k), así que `ef` no se toca y las búsquedas concurrentes no se pisan
+        labels, distances = self.index.knn_query(queries, k=limit)
+        return [
+            [(self.documents_by_label[label], 1 - float(distance)) for label, distance in zip(row_labels, row_distances)]
+            for row_labels, row_distances in zip(labels.tolist(), distances.tolist())
+        ]
+
+    def save(self, path, source_fingerprint=""):
+        """
+        Guardar el grafo HNSW en `path` y los documentos y parámetros en `path`.json.
+        Ambos se escriben a archivos temporales y se renombran, como los demás índices guardados.
+        """
+        path = Path(path)
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        self.index.save_index(str(temp_path))
+        os.replace(temp_path, path)
+        metadata = {
+            "fingerprint": source_fingerprint,
+            "dimensions": self.dimensions,
+            "M": self.M,
+            "ef_construction": self.ef_construction,
+            "ef": self.ef,
+            "next_label": self.next_label,
+            "documents": [[label, doc] for label, doc in self.documents_by_label.items()],
+        }
+        temp_metadata_path = f"{path}.{os.getpid()}.tmp.json"
+        with open(temp_metadata_path, "w", encoding="utf-8") as file:
+            json.dump(metadata, file, ensure_ascii=False)
+        os.replace(temp_metadata_path, f"{path}.json")
+
+    @classmethod
+    def load(cls, path, source_fingerprint=None):
+        """
+        Cargar un índice guardado; devuelve None si no existe o si la huella no coincide.
+        """
+        try:
+            with open(f"{path}.json", encoding="utf-8") as file:
+                metadata = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if source_fingerprint is not None and metadata["fingerprint"] != source_fingerprint:
+            return None
+        ann_index = cls.__new__(cls)
+        ann_index.dimensions = metadata["dimensions"]
+        ann_index.M = metadata["M"]
+        ann_index.ef_construction = metadata["ef_construction"]
+        ann_index.ef = metadata["ef"]
+        ann_index.index = hnswlib.Index(space="cosine", dim=ann_index.dimensions)
+        try:
+            ann_index.index.load_index(str(path), allow_replace_deleted=True)
+        except RuntimeError:
+            return None
+        ann_index.index.set_ef(ann_index.ef)
+        ann_index.documents_by_label = {label: doc for label, doc in metadata["documents"]}
+        ann_index.labels_by_id = {doc["id"]: label for label, doc in metadata["documents"]}
+        ann_index.next_label = metadata["next_label"]
+        return ann_index
+
+    @classmethod
+    def load_or_build(cls, documents, embeddings, path, source_fingerprint=None, **params):
+        """
+        Reutilizar el índice guardado en `path` si corresponde a estos documentos y vectores;
+        si no, construirlo y guardarlo para los próximos procesos.
+        Para un almacén en disco conviene pasar `source_fingerprint=store.fingerprint`, que sólo mira
+        los metadatos de sus archivos; sin ella se calcula la huella leyendo todos los vectores.
+        """
+        if source_fingerprint is None:
+            source_fingerprint = fingerprint(documents, embeddings)
+        ann_index = cls.load(path, source_fingerprint)
+        if ann_index is None:
+            ann_index = cls.build(documents, embeddings, **params)
+            ann_index.save(path, source_fingerprint)
+        return ann_index
+
+
+if __name__ == "__main__":
+    from llm_common.vector_store import VectorStore
+
+    parser = argparse.ArgumentParser(description="Construir por adelantado el índice HNSW de los fragmentos ingeridos.")
+    parser.add_argument("--chunks", default="rag_ingested_chunks")
+    args = parser.parse_args()
+
+    store = VectorStore.load(args.chunks)
+    ANNIndex.load_or_build(store.documents, store.embeddings, f"{args.chunks}.hnsw", store.fingerprint)
+    print(f"Índice HNSW de {args.chunks} listo.")
@@ -0,0 +1,240 @@
+import argparse
+import itertools
+import json
+import math
+import os
+import re
+import unicodedata
+
+import numpy as np
+
+from index_sources import fingerprint
+
+# Cambiar si cambia el analizador, para invalidar los índices guardados
+ANALYZER_VERSION = 1
+
+# Palabras vacías del español, ya sin acentos (el analizador las compara después de quitarlos)
+SPANISH_STOPWORDS = frozenset(
+    [
+        "a", "al", "algo", "algunas", "algunos", "ante", "antes", "como", "con", "contra", "cual", "cuales", "cuando",
+        "de", "del", "desde", "donde", "durante", "e", "el", "ella", "ellas", "ellos", "en", "entre", "era", "eran",
+        "es", "esa", "esas", "ese", "eso", "esos", "esta", "estaba", "estado", "estan", "estar", "estas", "este",
+        "esto", "estos", "fue", "fueron", "ha", "hace", "hacia", "han", "hasta", "hay", "la", "las", "le", "les", "lo",
+        "los", "mas", "me", "mi", "mis", "mucho", "muchos", "muy", "nada", "ni", "no", "nos", "nosotros", "o", "os",
+        "otra", "otras", "otro", "otros", "para", "pero", "poco", "por", "porque", "puede", "pueden", "que", "quien",
+        "quienes", "se", "sea", "sean", "ser", "si", "sido", "sin", "sobre", "sois", "solo", "son", "su", "sus",
+        "tambien", "tan", "tanto", "te", "tener", "tiene", "tienen", "todo", "todos", "tu", "tus", "un", "una", "unas",
+        "uno", "unos", "vosotros", "y", "ya", "yo", "cuanto", "cuanta", "cuantos", "cuantas",
+    ]
+)
+
+# Sufijos derivativos que el stemmer ligero quita antes de tratar plurales y vocales finales
+DERIVATIONAL_SUFFIXES = ("amientos", "imientos", "amiento", "imiento", "aciones", "uciones", "mente", "acion", "ucion")
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def fold_accents(text):
+    """
+    Pasar a minúsculas y quitar acentos y diéresis (también la tilde de la ñ).
+    """
+    decomposed = unicodedata.normalize("NFD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def stem(token):
+    """
+    Stemmer ligero para español: quita algunos sufijos derivativos comunes,
+    las terminaciones de plural y la vocal final, sin dejar raíces de menos de 3 letras.
+    """
+    if len(token) <= 3 or token.isdigit():
+        return token
+    for suffix in DERIVATIONAL_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[: -len(suffix)]
+    if token.endswith("ces") and len(token) > 4:
+        # luces -> luz, peces -> pez
+        token = token[:-3] + "z"
+    elif token.endswith("es") and len(token) > 4 and token[-3] not in "aeiou":
+        token = token[:-2]
+    elif token.endswith("s") and len(token) > 3:
+        token = token[:-1]
+    if token[-1] in "aeo" and len(token) > 3:
+        token = token[:-1]
+    return token
+
+
+def analyze(text):
+    """
+    Convertir un texto en la lista de términos que se indexan o se buscan:
+    minúsculas, sin acentos ni puntuación, sin palabras vacías y con stemming.
+    """
+    return [stem(token) for token in TOKEN_PATTERN.findall(fold_accents(text)) if token not in SPANISH_STOPWORDS]
+
+
+class BM25Index:
+    """
+    Índice invertido con puntuación BM25.
+    Las listas de postings se guardan como arreglos compactos de NumPy (ids de documento
+    int32 ordenados e impactos float32 ya calculados), y la búsqueda top-k usa la estrategia MaxScore:
+    las listas se recorren de mayor a menor cota y, en cuanto ningún documento no visto puede entrar
+    al top-k, las restantes dejan de ser esenciales: no se recorren, sólo se consultan con búsqueda
+    binaria para los candidatos que todavía pueden alcanzar el k-ésimo puntaje.
+    """
+
+    def __init__(self, refs, vocabulary, offsets, doc_ids, impacts):
+        self.refs = refs
+        self.vocabulary = vocabulary
+        self.term_ids = {term: i for i, term in enumerate(vocabulary)}
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.impacts = impacts
+        # Cota superior de la contribución de cada término, usada por MaxScore
+        self.max_impacts = np.array(
+            [impacts[start:end].max(initial=0) for start, end in itertools.pairwise(offsets)], dtype=np.float32
+        )
+
+    @classmethod
+    def build(cls, documents, ref, fields, k1=1.2, b=0.75):
+        """
+        Construir el índice a partir de documentos (diccionarios), concatenando los campos indicados.
+        """
+        refs = [str(doc[ref]) for doc in documents]
+        term_frequencies = []
+        for doc in documents:
+            frequencies = {}
+            for term in analyze(" ".join(str(doc.get(field, "")) for field in fields)):
+                frequencies[term] = frequencies.get(term, 0) + 1
+            term_frequencies.append(frequencies)
+
+        lengths = np.array([sum(frequencies.values()) for frequencies in term_frequencies], dtype=np.float32)
+        average_length = float(lengths.mean()) if len(lengths) and lengths.mean() > 0 else 1.0
+        postings = {}
+        for doc_index, frequencies in enumerate(term_frequencies):
+            for term, frequency in frequencies.items():
+                postings.setdefault(term, []).append((doc_index, frequency))
+
+        vocabulary = sorted(postings)
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        doc_ids = []
+        impacts = []
+        for i, term in enumerate(vocabulary):
+            term_postings = postings[term]
+            idf = math.log(1 + (len(documents) - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+            for doc_index, frequency in term_postings:
+                norm = k1 * (1 - b + b * lengths[doc_index] / average_length)
+                doc_ids.append(doc_index)
+                impacts.append(idf * frequency * (k1 + 1) / (frequency + norm))
+            offsets[i + 1] = len(doc_ids)
+        return cls(refs, vocabulary, offsets, np.array(doc_ids, dtype=np.int32), np.array(impacts, dtype=np.float32))
+
+    def search(self, query, limit=None):
+        """
+        Buscar la consulta y devolver [{"ref", "score"}, ...] de mayor a menor puntaje,
+        con el mismo formato que los resultados de lunr.
+        """
+        term_ids = sorted(
+            {self.term_ids[term] for term in analyze(query) if term in self.term_ids},
+            key=lambda term_id: self.max_impacts[term_id],
+            reverse=True,
+        )
+        if not term_ids:
+            return []
+        limit = limit or len(self.refs)
+        scores = np.zeros(len(self.refs), dtype=np.float32)
+        seen = np.zeros(len(self.refs), dtype=bool)
+        # remaining_bounds[i]: lo máximo que pueden sumar los términos desde la posición i
+        remaining_bounds = np.append(np.cumsum(self.max_impacts[term_ids][::-1])[::-1], 0)
+        for position, term_id in enumerate(term_ids):
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            scores[self.doc_ids[start:end]] += self.impacts[start:end]
+            seen[self.doc_ids[start:end]] = True
+            if limit < len(self.refs) and seen.sum() >= limit:
+                kth_score = np.partition(scores[seen], -limit)[-limit]
+                if kth_score > remaining_bounds[position + 1]:
+                    # Ningún documento no visto puede entrar al top-k: el resto de listas no son esenciales
+                    candidates = np.flatnonzero(seen)
+                    self.score_candidates(scores, candidates, term_ids, remaining_bounds, position + 1, kth_score)
+                    break
+        matched = np.flatnonzero(seen)
+        top = matched[np.argsort(-scores[matched], kind="stable")[:limit]]
+        return [{"ref": self.refs[i], "score": float(scores[i])} for i in top]
+
+    def score_candidates(self, scores, candidates, term_ids, remaining_bounds, first, kth_score):
+        """
+        Sumar a los candidatos los impactos de los términos no esenciales desde la posición `first`,
+        buscando cada candidato en la lista con búsqueda binaria en lugar de recorrerla.
+        Antes de cada término se descartan los candidatos que ni con el máximo de los términos
+        restantes alcanzan el k-ésimo puntaje (que sólo puede subir).
+        """
+        for position in range(first, len(term_ids)):
+            candidates = candidates[scores[candidates] + remaining_bounds[position] >= kth_score]
+            if len(candidates) == 0:
+                return
+            start, end = self.offsets[term_ids[position]], self.offsets[term_ids[position] + 1]
+            doc_ids = self.doc_ids[start:end]
+            found = np.searchsorted(doc_ids, candidates)
+            matches = found < len(doc_ids)
+            matches[matches] = doc_ids[found[matches]] == candidates[matches]
+            scores[candidates[matches]] += self.impacts[start:end][found[matches]]
+
+    def save(self, path, source_fingerprint=""):
+        """
+        Guardar el índice en un archivo .npz junto con la huella de los datos de origen.
+        """
+        temp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            temp_path,
+            fingerprint=np.array(source_fingerprint),
+            refs=np.array(json.dumps(self.refs, ensure_ascii=False)),
+            vocabulary=np.array(json.dumps(self.vocabulary, ensure_ascii=False)),
+            offsets=self.offsets,
+            doc_ids=self.doc_ids,
+            impacts=self.impacts,
+        )
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path, source_fingerprint=None):
+        """
+        Cargar un índice guardado; devuelve None si no existe o si la huella no coincide.
+        """
+        try:
+            data = np.load(path)
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+        with data:
+            if source_fingerprint is not None and str(data["fingerprint"]) != source_fingerprint:
+                return None
+            return cls(
+                json.loads(str(data["refs"])),
+                json.loads(str(data["vocabulary"])),
+                data["offsets"],
+                data["doc_ids"],
+                data["impacts"],
+            )
+
+    @classmethod
+    def load_or_build(cls, documents, ref, fields, path):
+        """
+        Reutilizar el índice guardado en `path` si corresponde a estos documentos;
+        si no, construirlo y guardarlo para los próximos procesos.
+        """
+        source_fingerprint = fingerprint(documents, ref, fields, version=f"bm25-{ANALYZER_VERSION}")
+        index = cls.load(path, source_fingerprint)
+        if index is None:
+            index = cls.build(documents, ref, fields)
+            index.save(path, source_fingerprint)
+        return index
+
+
+if __name__ == "__main__":
+    from llm_common.vector_store import VectorStore
+
+    parser = argparse.ArgumentParser(description="Construir por adelantado el índice BM25 de los fragmentos ingeridos.")
+    parser.add_argument("--chunks", default="rag_ingested_chunks")
+    args = parser.parse_args()
+
+    chunk_docs = VectorStore.load(args.chunks).documents
+    BM25Index.load_or_build(chunk_docs, "id", ["text"], f"{args.chunks}.bm25.npz")
+    print(f"Índice BM25 de {args.chunks} listo.")
@@ -0,0 +1,68 @@
+import functools
+
+
+@functools.cache
+def get_encoding(model):
+    """
+    Codificación de tiktoken para el modelo. Acepta nombres con prefijo ("openai/gpt-4o")
+    y usa o200k_base para modelos que tiktoken no conoce (por ejemplo, los de Ollama).
+    tiktoken se importa aquí, la primera vez que se cuentan tokens.
+    """
+    import tiktoken
+
+    try:
+        return tiktoken.encoding_for_model(model.split("/")[-1])
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text, model="gpt-4o"):
+    return len(get_encoding(model).encode(text))
+
+
+def is_duplicate(text, included_texts):
+    """
+    Si `text` ya está en el contexto: es igual a un texto incluido o está contenido en él.
+    """
+    return any(text in included for included in included_texts)
+
+
+def build_context(sources, max_tokens=2000, get_text=None, format_source=None, header="", model="gpt-4o"):
+    """
+    Armar el contexto para el prompt con las fuentes en orden de relevancia,
+    hasta un presupuesto de `max_tokens` tokens (incluyendo `header`).
+    Se quitan las fuentes duplicadas (iguales a una ya incluida o contenidas en ella),
+    y las fuentes que no caben se omiten para dar lugar a otras más cortas.
+    No se recorta el texto compartido entre fragmentos consecutivos: con el divisor de la ingesta
+    los fragmentos del corpus no repiten el final del anterior, así que no habría nada que quitar.
+    Devuelve el contexto y un diccionario con estadísticas de tokens.
+    """
+    get_text = get_text or (lambda source: source["text"])
+    format_source = format_source or (lambda source, text: f"{source['id']}: {text}")
+    header_tokens = count_tokens(header, model) if header else 0
+    used_tokens = header_tokens
+    original_tokens = header_tokens
+    included_texts = []
+    parts = [header] if header else []
+    stats = {"sources": len(sources), "included": 0, "deduplicated": 0, "dropped": 0}
+
+    for source in sources:
+        text = get_text(source)
+        part = format_source(source, text)
+        part_tokens = count_tokens(part, model) + 1  # +1 por el salto de línea
+        original_tokens += part_tokens
+        if is_duplicate(text, included_texts):
+            stats["deduplicated"] += 1
+            continue
+        if used_tokens + part_tokens > max_tokens:
+            stats["dropped"] += 1
+            continue
+        parts.append(part)
+        included_texts.append(text)
+        used_tokens += part_tokens
+        stats["included"] += 1
+
+    stats.update(
+        {"max_tokens": max_tokens, "tokens": used_tokens, "saved_tokens": max(original_tokens - used_tokens, 0)}
+    )
+    return "\n".join(parts), stats
@@ -0,0 +1,69 @@
+import asyncio
+import random
+
+import openai
+
+# Errores transitorios que vale la pena reintentar
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+def batched(items, batch_size):
+    """
+    Dividir una lista en lotes de como máximo `batch_size` elementos.
+    """
+    return [items[i : i + batch_size] for i in range(0, len(items), batch_size)]
+
+
+def retry_delay(error, attempt, base_delay, max_delay):
+    """
+    Calcular la espera antes del siguiente intento: respeta el encabezado Retry-After
+    si el servidor lo envía y, si no, usa backoff exponencial con jitter.
+    """
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), max_delay)
+        except ValueError:
+            pass
+    return min(base_delay * 2**attempt, max_delay) * random.uniform(0.5, 1)
+
+
+async def embed_batch(client, texts, model, max_retries=6, base_delay=1.0, max_delay=60.0):
+    """
+    Generar los embeddings de un lote de textos con una sola llamada `input=[...]`,
+    reintentando con backoff cuando hay límites de tasa o errores transitorios.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            response = await client.embeddings.create(model=model, input=texts)
+            # La API puede devolver los datos en cualquier orden, así que ordenamos por índice
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+        except RETRYABLE_ERRORS as error:
+            if attempt == max_retries:
+                raise
+            delay = retry_delay(error, attempt, base_delay, max_delay)
+            print(f"Error transitorio al generar embeddings ({type(error).__name__}), reintentando en {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+async def embed_texts(client, texts, model, batch_size=64, max_concurrency=4, semaphore=None, **retry_options):
+    """
+    Generar embeddings para todos los textos, enviándolos en lotes y con
+    como máximo `max_concurrency` solicitudes en vuelo a la vez.
+    Se puede pasar un `semaphore` compartido para limitar la concurrencia entre varias llamadas.
+    Devuelve los embeddings en el mismo orden que los textos.
+    """
+    semaphore = semaphore or asyncio.Semaphore(max_concurrency)
+
+    async def embed_with_limit(batch):
+        async with semaphore:
+            return await embed_batch(client, batch, model, **retry_options)
+
+    results = await asyncio.gather(*(embed_with_limit(batch) for batch in batched(texts, batch_size)))
+    return [embedding for batch_embeddings in results for embedding in batch_embeddings]
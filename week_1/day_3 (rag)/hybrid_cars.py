@@ -0,0 +1,185 @@
+import csv
+import json
+import unicodedata
+from pathlib import Path
+
+import numpy as np
+
+# Columnas numéricas del CSV y su tipo
+NUMERIC_COLUMNS = {"año": np.int32, "precio": np.float64, "aceleración": np.float32, "consumo": np.float32}
+TEXT_COLUMNS = ("vehículo", "clase")
+OPERATORS = ("=", "!=", "<", "<=", ">", ">=", "contiene")
+# Filas que puede pedir el modelo por consulta, para que el resultado no crezca el prompt sin control
+MAX_LIMIT = 50
+
+# Herramienta para que el modelo consulte la tabla con function calling
+QUERY_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "consultar_autos",
+        "description": (
+            "Consulta la tabla de autos híbridos con filtros, orden y límite. "
+            "Columnas: vehículo (texto), año (entero), precio (dólares), "
+            "aceleración (km/h por segundo, mayor es más rápido), consumo (millas por galón, mayor es más eficiente), "
+            "clase (texto: Compacto, Mediano, Grande, Biplaza, SUV, Minivan o Camioneta)."
+        ),
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "filtros": {
+                    "type": "array",
+                    "description": "Condiciones que deben cumplir todas las filas.",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "columna": {"type": "string", "enum": list(TEXT_COLUMNS) + list(NUMERIC_COLUMNS)},
+                            "operador": {"type": "string", "enum": list(OPERATORS)},
+                            "valor": {"type": ["string", "number"]},
+                        },
+                        "required": ["columna", "operador", "valor"],
+                    },
+                },
+                "ordenar_por": {"type": "string", "enum": list(TEXT_COLUMNS) + list(NUMERIC_COLUMNS)},
+                "descendente": {"type": "boolean"},
+                "limite": {"type": "integer", "minimum": 1, "maximum": MAX_LIMIT},
+            },
+        },
+    },
+}
+
+
+def fold_text(text):
+    """
+    Minúsculas y sin acentos, para comparar textos sin importar cómo se escribieron.
+    """
+    decomposed = unicodedata.normalize("NFD", str(text).lower().strip())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+class HybridCarTable:
+    """
+    Tabla columnar en memoria sobre hybridos.csv.
+    Las columnas numéricas son arreglos de NumPy con un índice ordenado (argsort) precalculado,
+    así que los filtros por rango usan búsqueda binaria y el orden no requiere volver a ordenar.
+    """
+
+    def __init__(self, header, rows):
+        self.header = header
+        self.rows = rows
+        self.columns = {}
+        self.sorted_indexes = {}
+        self.sorted_values = {}
+        for position, name in enumerate(header):
+            values = [row[position] for row in rows]
+            if name in NUMERIC_COLUMNS:
+                column = np.array([float(value) for value in values]).astype(NUMERIC_COLUMNS[name])
+            else:
+                column = np.array([fold_text(value) for value in values], dtype=object)
+            self.columns[name] = column
+            self.sorted_indexes[name] = np.argsort(column, kind="stable")
+            self.sorted_values[name] = column[self.sorted_indexes[name]]
+
+    @classmethod
+    def from_csv(cls, path):
+        with Path(path).open(newline="", encoding="utf-8") as file:
+            header, *rows = list(csv.reader(file))
+        return cls(header, rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def filter_mask(self, column_name, operator, value):
+        """
+        Máscara booleana de las filas que cumplen una condición.
+        """
+        if column_name not in self.columns:
+            raise ValueError(f"Columna desconocida: {column_name}. Columnas: {self.header}")
+        if operator not in OPERATORS:
+            raise ValueError(f"Operador desconocido: {operator}. Operadores: {OPERATORS}")
+        column = self.columns[column_name]
+        mask = np.zeros(len(self.rows), dtype=bool)
+        if column_name not in NUMERIC_COLUMNS:
+            value = fold_text(value)
+            if operator == "contiene":
+                mask[:] = [value in text for text in column]
+            elif operator in ("=", "!="):
+                mask[:] = column == value
+                if operator == "!=":
+                    mask = ~mask
+            else:
+                raise ValueError(f"El operador {operator} no aplica a la columna de texto {column_name}")
+            return mask
+
+        if operator == "contiene":
+            raise ValueError(f"El operador contiene no aplica a la columna numérica {column_name}")
+        value = float(value)
+        order = self.sorted_indexes[column_name]
+        sorted_values = self.sorted_values[column_name]
+        # Búsqueda binaria sobre los valores ordenados: sólo marcamos el rango que cumple la condición
+        left = np.searchsorted(sorted_values, value, side="left")
+        right = np.searchsorted(sorted_values, value, side="right")
+        selected = {
+            "=": order[left:right],
+            "<": order[:left],
+            "<=": order[:right],
+            ">": order[right:],
+            ">=": order[left:],
+        }.get(operator)
+        if selected is None:
+            mask[:] = True
+            mask[order[left:right]] = False
+        else:
+            mask[selected] = True
+        return mask
+
+    def query(self, filters=None, sort_by=None, descending=False, limit=10):
+        """
+        Filtrar, ordenar y limitar las filas. Los filtros son diccionarios con
+        las claves "columna", "operador" y "valor". Devuelve las filas originales del CSV.
+        """
+        mask = np.ones(len(self.rows), dtype=bool)
+        for condition in filters or []:
+            mask &= self.filter_mask(condition["columna"], condition["operador"], condition["valor"])
+        if sort_by:
+            if sort_by not in self.sorted_indexes:
+                raise ValueError(f"Columna desconocida: {sort_by}. Columnas: {self.header}")
+            order = self.sorted_indexes[sort_by]
+            if descending:
+                order = order[::-1]
+            selected = order[mask[order]]
+        else:
+            selected = np.flatnonzero(mask)
+        return [self.rows[i] for i in selected[:limit]]
+
+    def to_markdown(self, rows):
+        """
+        Formatear filas como tabla markdown, ya que los llms entienden markdown.
+        """
+        table = " | ".join(self.header) + "\n" + " | ".join(" --- " for _ in self.header) + "\n"
+        return table + "\n".join(" | ".join(row) for row in rows)
+
+    def run_tool_call(self, arguments_json):
+        """
+        Ejecutar una llamada a la herramienta `consultar_autos` con sus argumentos en JSON, tal como
+        los envía el modelo, y devolver el resultado como tabla markdown (o el error, para que el modelo
+        pueda corregirse, también si el JSON no es válido). El límite se acota a 1..MAX_LIMIT filas.
+        """
+        try:
+            arguments = json.loads(arguments_json)
+        except json.JSONDecodeError as error:
+            return f"Error en los argumentos (JSON no válido): {error}"
+        if not isinstance(arguments, dict):
+            return "Error en los argumentos: se esperaba un objeto JSON"
+        limit = arguments.get("limite", 10)
+        if isinstance(limit, bool) or not isinstance(limit, (int, float)) or not float(limit).is_integer():
+            return f"Error en los argumentos: limite debe ser un entero entre 1 y {MAX_LIMIT}, no {limit!r}"
+        try:
+            rows = self.query(
+                filters=arguments.get("filtros"),
+                sort_by=arguments.get("ordenar_por"),
+                descending=arguments.get("descendente", False),
+                limit=max(1, min(MAX_LIMIT, int(limit))),
+            )
+        except (ValueError, TypeError, KeyError) as error:
+            return f"Error en la consulta: {error}"
+        return self.to_markdown(rows)
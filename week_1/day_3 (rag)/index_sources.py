@@ -0,0 +1,27 @@
+import csv
+import hashlib
+import json
+from pathlib import Path
+
+
+def csv_documents(csv_path):
+    """
+    Leer el CSV y convertir cada fila en un documento {"id", "body"} para indexarlo.
+    Devuelve también las filas, incluyendo el encabezado.
+    """
+    with Path(csv_path).open(newline="", encoding="utf-8") as file:
+        rows = list(csv.reader(file))
+    documents = [{"id": (i + 1), "body": " ".join(row)} for i, row in enumerate(rows[1:])]
+    return rows, documents
+
+
+def fingerprint(documents, ref, fields, version):
+    """
+    Huella de los datos de origen de un índice guardado: cambia si cambian los documentos indexados,
+    los campos o la versión del indexador (lunr, BM25...).
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([version, ref, fields]).encode("utf-8"))
+    for doc in documents:
+        digest.update(json.dumps([doc[ref]] + [doc.get(field) for field in fields], ensure_ascii=False).encode("utf-8"))
+    return digest.hexdigest()
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import sqlite3
+
+import numpy as np
+
+
+def text_hash(text):
+    """
+    Hash SHA-256 del texto de un fragmento, usado como clave del caché de embeddings.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def file_hash(path, block_size=1 << 20):
+    """
+    Hash SHA-256 del contenido de un archivo, leído por bloques.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while block := file.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestionCache:
+    """
+    Caché persistente (SQLite) para la ingesta incremental:
+    - los fragmentos extraídos de cada archivo, junto con su huella (tamaño, mtime y hash),
+      para no volver a extraer los PDFs que no cambiaron;
+    - los embeddings de cada fragmento, con clave (modelo, hash del texto),
+      para no volver a llamar a la API por textos que ya conocemos.
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
+                chunks TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            );
+            """
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def get_file_chunks(self, path):
+        """
+        Devolver los fragmentos guardados de un archivo si no ha cambiado desde la
+        última ingesta, o None si hay que volver a extraerlo.
+        Si el tamaño y el mtime coinciden no se lee el archivo; si sólo cambió el mtime,
+        se compara el hash del contenido (y se actualiza la huella si es el mismo).
+        """
+        row = self.connection.execute(
+            "SELECT size, mtime_ns, sha256, chunks FROM files WHERE path = ?", (str(path),)
+        ).fetchone()
+        if row is None:
+            return None
+        size, mtime_ns, sha256, chunks = row
+        stat = os.stat(path)
+        if stat.st_size != size:
+            return None
+        if stat.st_mtime_ns != mtime_ns:
+            if file_hash(path) != sha256:
+                return None
+            with self.connection:
+                self.connection.execute("UPDATE files SET mtime_ns = ? WHERE path = ?", (stat.st_mtime_ns, str(path)))
+        return json.loads(chunks)
+
+    def put_file_chunks(self, path, chunks):
+        """
+        Guardar los fragmentos (id y texto) de un archivo junto con su huella actual.
+        """
+        stat = os.stat(path)
+        chunks = [{"id": chunk["id"], "text": chunk["text"]} for chunk in chunks]
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, sha256, chunks) VALUES (?, ?, ?, ?, ?)",
+                (str(path), stat.st_size, stat.st_mtime_ns, file_hash(path), json.dumps(chunks, ensure_ascii=False)),
+            )
+
+    def get_embeddings(self, model, texts):
+        """
+        Buscar los embeddings ya calculados para los textos dados.
+        Devuelve un diccionario {texto: embedding} sólo con los textos encontrados.
+        """
+        hashes = {text_hash(text): text for text in texts}
+        found = {}
+        hash_list = list(hashes)
+        # SQLite limita el número de parámetros por consulta, así que consultamos por lotes
+        for i in range(0, len(hash_list), 500):
+            batch = hash_list[i : i + 500]
+            placeholders = ", ".join("?" for _ in batch)
+            rows = self.connection.execute(
+                f"SELECT text_hash, embedding FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                (model, *batch),
+            )
+            for hash_value, embedding in rows:
+                found[hashes[hash_value]] = np.frombuffer(embedding, dtype=np.float32)
+        return found
+
+    def put_embeddings(self, model, texts, embeddings):
+        """
+        Guardar los embeddings de los textos dados para el modelo indicado.
+        """
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, embedding) VALUES (?, ?, ?)",
+                [
+                    (model, text_hash(text), np.asarray(embedding, dtype=np.float32).tobytes())
+                    for text, embedding in zip(texts, embeddings)
+                ],
+            )
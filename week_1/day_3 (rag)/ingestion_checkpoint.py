@@ -0,0 +1,79 @@
+import json
+import os
+
+
+class IngestionCheckpoint:
+    """
+    Registro de sólo-anexado (JSON Lines) de los fragmentos ya ingeridos.
+    Cada archivo se escribe como sus fragmentos (con embedding) seguidos de una
+    línea {"completed": <archivo>}; al reanudar después de una falla, los archivos
+    completados se saltan y los fragmentos de un archivo a medias se descartan.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.completed_files = self.recover()
+
+    def recover(self):
+        """
+        Leer el registro existente, quedarse sólo con los archivos completados
+        (reescribiéndolo si había fragmentos de un archivo sin terminar)
+        y devolver el conjunto de archivos completados.
+        """
+        if not os.path.exists(self.path):
+            return set()
+        completed_files = set()
+        has_partial_lines = False
+        temp_path = f"{self.path}.tmp"
+        with open(self.path, encoding="utf-8") as source, open(temp_path, "w", encoding="utf-8") as target:
+            pending_lines = []
+            for line in source:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Línea truncada por una falla mientras se escribía
+                    has_partial_lines = True
+                    continue
+                pending_lines.append(line)
+                if "completed" in record:
+                    target.writelines(pending_lines)
+                    completed_files.add(record["completed"])
+                    pending_lines = []
+            has_partial_lines = has_partial_lines or bool(pending_lines)
+        if has_partial_lines:
+            os.replace(temp_path, self.path)
+        else:
+            os.remove(temp_path)
+        return completed_files
+
+    def append_file(self, filename, chunks):
+        """
+        Anexar los fragmentos de un archivo y marcarlo como completado.
+        Se fuerza la escritura a disco para que el checkpoint sobreviva a una falla.
+        """
+        with open(self.path, "a", encoding="utf-8") as file:
+            for chunk in chunks:
+                embedding = chunk["embedding"]
+                record = {**chunk, "embedding": embedding.tolist() if hasattr(embedding, "tolist") else embedding}
+                file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            file.write(json.dumps({"completed": filename}) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        self.completed_files.add(filename)
+
+    def iter_chunks(self):
+        """
+        Recorrer los fragmentos registrados, uno a la vez, sin cargar todo el archivo.
+        """
+        with open(self.path, encoding="utf-8") as file:
+            for line in file:
+                record = json.loads(line)
+                if "completed" not in record:
+                    yield record
+
+    def remove(self):
+        """
+        Eliminar el registro una vez que la ingesta terminó correctamente.
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,102 @@
+import argparse
+import json
+import os
+from pathlib import Path
+
+import lunr as lunr_package
+from lunr import lunr
+from lunr.index import Index
+from lunr.pipeline import Pipeline
+from lunr.token_set import TokenSet
+from lunr.vector import Vector
+
+from index_sources import csv_documents, fingerprint
+
+
+def serialize_token_set(root):
+    """
+    Aplanar el autómata del token set en una lista de nodos [final, [[etiqueta, hijo], ...]].
+    `Index.load` lo reconstruye insertando cada término y minimizando, que es
+    casi tan lento como construir el índice; así lo podemos cargar en tiempo lineal.
+    """
+    node_ids = {id(root): 0}
+    nodes = [root]
+    serialized = []
+    for node in nodes:
+        edges = []
+        for label, child in node.edges.items():
+            if id(child) not in node_ids:
+                node_ids[id(child)] = len(nodes)
+                nodes.append(child)
+            edges.append([label, node_ids[id(child)]])
+        serialized.append([node.final, edges])
+    return serialized
+
+
+def load_token_set(serialized):
+    nodes = [TokenSet() for _ in serialized]
+    for node, (final, edges) in zip(nodes, serialized):
+        node.final = final
+        node.edges = {label: nodes[child] for label, child in edges}
+    return nodes[0]
+
+
+def save_index(index, path, source_fingerprint):
+    """
+    Guardar el índice serializado junto con la huella de los datos de origen.
+    Se escribe a un archivo temporal y se renombra, para que varios procesos
+    puedan construirlo a la vez sin dejar un archivo a medias.
+    """
+    data = {
+        "fingerprint": source_fingerprint,
+        "index": index.serialize(),
+        "tokenSet": serialize_token_set(index.token_set),
+    }
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(data, file, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def load_index(path, source_fingerprint):
+    """
+    Cargar un índice guardado si existe y su huella coincide; si no, devolver None.
+    """
+    try:
+        with open(path, encoding="utf-8") as file:
+            data = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if data.get("fingerprint") != source_fingerprint:
+        return None
+    serialized_index = data["index"]
+    return Index(
+        fields=serialized_index["fields"],
+        field_vectors={ref: Vector(elements) for ref, elements in serialized_index["fieldVectors"]},
+        inverted_index=dict(serialized_index["invertedIndex"]),
+        token_set=load_token_set(data["tokenSet"]),
+        pipeline=Pipeline.load(serialized_index["pipeline"]),
+    )
+
+
+def load_or_build_index(documents, ref, fields, path):
+    """
+    Reutilizar el índice lunr guardado en `path` si corresponde a estos documentos;
+    si no, construirlo y guardarlo para los próximos procesos.
+    """
+    source_fingerprint = fingerprint(documents, ref, fields, version=lunr_package.__VERSION__)
+    index = load_index(path, source_fingerprint)
+    if index is None:
+        index = lunr(ref=ref, fields=fields, documents=documents)
+        save_index(index, path, source_fingerprint)
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Construir por adelantado el índice lunr del CSV de autos híbridos.")
+    parser.add_argument("--csv", default="hybridos.csv")
+    args = parser.parse_args()
+
+    _, csv_docs = csv_documents(args.csv)
+    load_or_build_index(csv_docs, "id", ["body"], Path(args.csv).with_suffix(".lunr.json"))
+    print(f"Índice de {args.csv} listo.")
@@ -0,0 +1,53 @@
+import asyncio
+import os
+import pathlib
+from concurrent.futures import ProcessPoolExecutor
+
+# Divisor de texto del proceso actual: se construye una sola vez por worker en init_worker
+text_splitter = None
+
+
+def init_worker(model_name="gpt-4o", chunk_size=500, chunk_overlap=125):
+    """
+    Inicializar un proceso worker: construye el tokenizador de tiktoken y el
+    divisor de texto una sola vez, en lugar de hacerlo para cada archivo.
+    langchain se importa aquí: sólo lo cargan los procesos que realmente dividen PDFs.
+    """
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    global text_splitter
+    text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        model_name=model_name, chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    )
+
+
+def extract_chunks(path):
+    """
+    Extraer el texto de un PDF como markdown y dividirlo en fragmentos.
+    Devuelve el nombre del archivo y la lista de fragmentos (id y texto).
+    """
+    import pymupdf4llm
+
+    if text_splitter is None:
+        init_worker()
+    path = pathlib.Path(path)
+    md_text = pymupdf4llm.to_markdown(path)
+    texts = text_splitter.create_documents([md_text])
+    return path.name, [{"id": f"{path.name}-{(i + 1)}", "text": text.page_content} for i, text in enumerate(texts)]
+
+
+async def extract_files(paths, max_workers=None, model_name="gpt-4o", chunk_size=500, chunk_overlap=125):
+    """
+    Extraer y dividir varios PDFs en paralelo en un pool de procesos,
+    entregando (nombre de archivo, fragmentos) a medida que cada uno termina.
+    """
+    if not paths:
+        return
+    max_workers = min(max_workers or os.cpu_count() or 1, len(paths))
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(
+        max_workers=max_workers, initializer=init_worker, initargs=(model_name, chunk_size, chunk_overlap)
+    ) as pool:
+        futures = [loop.run_in_executor(pool, extract_chunks, path) for path in paths]
+        for future in asyncio.as_completed(futures):
+            yield await future
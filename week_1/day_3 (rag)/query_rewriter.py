@@ -0,0 +1,176 @@
+import difflib
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from bm25 import SPANISH_STOPWORDS, fold_accents
+from llm_common.query_embedding_cache import normalize_query
+
+WORD_PATTERN = re.compile(r"\w+")
+
+# Palabras que suelen referirse a algo dicho antes ("¿y ese?", "el anterior", "cuál de ellos")
+REFERENCE_WORDS = frozenset(
+    [
+        "ese", "esa", "esos", "esas", "este", "esta", "estos", "estas", "eso", "esto", "ello", "ellos", "ellas",
+        "aquel", "aquella", "aquellos", "aquellas", "anterior", "anteriores", "mismo", "misma", "mismos", "mismas",
+        "otro", "otra", "otros", "otras", "primero", "primera", "segundo", "segunda", "ultimo", "ultima", "tambien",
+        "ademas", "comparado", "comparada",
+    ]
+)
+
+
+def build_vocabulary(texts):
+    """
+    Vocabulario del índice: cada palabra sin acentos apunta a su forma original en minúsculas,
+    que es la que hay que buscar.
+    """
+    vocabulary = {}
+    for text in texts:
+        for word in WORD_PATTERN.findall(text.lower()):
+            vocabulary.setdefault(fold_accents(word), word)
+    return vocabulary
+
+
+def query_overlap(first, second):
+    """
+    Similitud de Jaccard entre las palabras (sin acentos ni palabras vacías) de dos consultas.
+    """
+    first_words = {word for word in WORD_PATTERN.findall(fold_accents(first)) if word not in SPANISH_STOPWORDS}
+    second_words = {word for word in WORD_PATTERN.findall(fold_accents(second)) if word not in SPANISH_STOPWORDS}
+    if not first_words or not second_words:
+        return 0.0
+    return len(first_words & second_words) / len(first_words | second_words)
+
+
+class QueryRewriter:
+    """
+    Etapa de reescritura de consultas que evita la llamada al LLM cuando puede.
+    Primero normaliza la pregunta localmente (minúsculas, sin puntuación ni acentos, sin palabras vacías)
+    y corrige errores tipográficos contra el vocabulario del índice. Sólo llama a `rewrite_with_llm`
+    si la pregunta depende del historial o si la consulta local no encuentra nada, y guarda esas
+    reescrituras en un LRU con clave (pregunta normalizada, huella del historial reciente).
+    Con `rewrite_and_search`, la búsqueda con la pregunta original corre mientras el LLM reescribe.
+    """
+
+    def __init__(self, vocabulary, rewrite_with_llm, max_entries=256, typo_cutoff=0.8):
+        self.vocabulary = vocabulary
+        self.vocabulary_words = list(vocabulary)
+        self.rewrite_with_llm = rewrite_with_llm
+        self.max_entries = max_entries
+        self.typo_cutoff = typo_cutoff
+        self.corrections = {}
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.local_rewrites = 0
+        self.cache_hits = 0
+        self.llm_rewrites = 0
+        self.speculative_hits = 0
+        # Hilo para la llamada al LLM mientras se hace la búsqueda especulativa
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="query-rewriter")
+
+    def correct(self, word):
+        """
+        Forma del vocabulario más parecida a la palabra, o None si no hay ninguna suficientemente cercana.
+        """
+        if word in self.vocabulary:
+            return self.vocabulary[word]
+        if word not in self.corrections:
+            matches = difflib.get_close_matches(word, self.vocabulary_words, n=1, cutoff=self.typo_cutoff)
+            self.corrections[word] = self.vocabulary[matches[0]] if matches else None
+        return self.corrections[word]
+
+    def local_query(self, question):
+        """
+        Consulta de keywords construida sin el LLM: palabras de la pregunta que están
+        (o casi están) en el vocabulario del índice.
+        """
+        words = [word for word in WORD_PATTERN.findall(fold_accents(question)) if word not in SPANISH_STOPWORDS]
+        corrected = (self.correct(word) for word in words)
+        return " ".join(dict.fromkeys(word for word in corrected if word))
+
+    @staticmethod
+    def needs_history(question, history):
+        """
+        Heurística: la pregunta necesita el historial si lo hay y empieza con "y"/"e"
+        o usa palabras que se refieren a algo mencionado antes.
+        """
+        if not history:
+            return False
+        words = WORD_PATTERN.findall(fold_accents(question))
+        return bool(words) and (words[0] in ("y", "e") or any(word in REFERENCE_WORDS for word in words))
+
+    def rewrite(self, question, history, search):
+        """
+        Reescribir la pregunta y buscar, devolviendo (consulta, resultados). `search(query)` devuelve
+        la lista de resultados; si la consulta local no encuentra nada, se recurre al LLM (o a su caché)
+        y se busca con la consulta reescrita. Cada consulta se busca una sola vez.
+        """
+        if not self.needs_history(question, history):
+            query = self.local_query(question)
+            results = search(query) if query else []
+            if results:
+                with self.lock:
+                    self.local_rewrites += 1
+                return query, results
+        query = self.rewrite_cached(question, history)
+        return query, search(query)
+
+    def rewrite_cached(self, question, history):
+        """
+        Reescribir con el LLM, o devolver la reescritura guardada para la misma pregunta e historial.
+        """
+        history_hash = hashlib.sha256(history.encode("utf-8")).hexdigest() if history else ""
+        key = (normalize_query(question), history_hash)
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                self.cache_hits += 1
+                return self.cache[key]
+        query = self.rewrite_with_llm(question, history)
+        with self.lock:
+            self.llm_rewrites += 1
+            self.cache[key] = query
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+        return query
+
+    def rewrite_and_search(self, question, history, search, min_overlap=0.5):
+        """
+        Reescribir la pregunta y buscar, devolviendo (consulta, resultados). `search(query)` devuelve
+        la lista de resultados. Si hace falta el LLM, la búsqueda con la consulta local se hace mientras
+        tanto y se reutiliza si la consulta reescrita se parece lo suficiente (Jaccard >= `min_overlap`);
+        así el caso común tarda un solo viaje al LLM en lugar de reescritura y búsqueda en serie.
+        La consulta devuelta es siempre la que produjo los resultados.
+        """
+        if not self.needs_history(question, history):
+            return self.rewrite(question, history, search)
+
+        future = self.executor.submit(self.rewrite_cached, question, history)
+        speculative_query = self.local_query(question)
+        speculative_results = search(speculative_query) if speculative_query else []
+        query = future.result()
+        if speculative_results and query_overlap(query, speculative_query) >= min_overlap:
+            with self.lock:
+                self.speculative_hits += 1
+            return speculative_query, speculative_results
+        return query, search(query)
+
+    def stats(self):
+        """
+        Reescrituras resueltas localmente, desde el caché y con el LLM; las dos primeras se saltaron la llamada.
+        """
+        total = self.local_rewrites + self.cache_hits + self.llm_rewrites
+        skipped = self.local_rewrites + self.cache_hits
+        return {
+            "local": self.local_rewrites,
+            "cached": self.cache_hits,
+            "llm": self.llm_rewrites,
+            "skipped": skipped,
+            "skip_rate": skipped / total if total else 0.0,
+            "speculative_hits": self.speculative_hits,
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=False)
@@ -1,75 +1,59 @@
-import csv
 import os
 from pathlib import Path
 
-import azure.identity
-import openai
 from dotenv import load_dotenv
-from lunr import lunr
+
+from hybrid_cars import QUERY_TOOL, HybridCarTable
+from llm_common.openai_clients import get_client, get_host, get_model_name
 
 # Configura el cliente de OpenAI para usar la API de Azure, OpenAI.com u Ollama
 load_dotenv(override=True)
-API_HOST = os.getenv("API_HOST", "github")
-
-if API_HOST == "azure":
-    token_provider = azure.identity.get_bearer_token_provider(
-        azure.identity.DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default"
-    )
-    client = openai.OpenAI(
-        base_url=os.environ["AZURE_OPENAI_ENDPOINT"],
-        api_key=token_provider,
-    )
-    MODEL_NAME = os.environ["AZURE_OPENAI_CHAT_DEPLOYMENT"]
-
-elif API_HOST == "ollama":
-    client = openai.OpenAI(base_url=os.environ["OLLAMA_ENDPOINT"], api_key="nokeyneeded")
-    MODEL_NAME = os.environ["OLLAMA_MODEL"]
-
-elif API_HOST == "github":
-    client = openai.OpenAI(base_url="https://models.github.ai/inference", api_key=os.environ["GITHUB_TOKEN"])
-    MODEL_NAME = os.getenv("GITHUB_MODEL", "openai/gpt-4o")
-
-else:
-    client = openai.OpenAI(api_key=os.environ["OPENAI_KEY"])
-    MODEL_NAME = os.environ["OPENAI_MODEL"]
+API_HOST = get_host()
+client = get_client(API_HOST)
+MODEL_NAME = get_model_name(API_HOST)
 
-# Indexamos los datos del CSV
+# Cargamos el CSV como una tabla columnar con tipos numéricos, que el modelo consulta con function calling
 CSV_PATH = Path(__file__).with_name("hybridos.csv")
-with CSV_PATH.open(newline="", encoding="utf-8") as file:
-    reader = csv.reader(file)
-    rows = list(reader)
-documents = [{"id": (i + 1), "body": " ".join(row)} for i, row in enumerate(rows[1:])]
-index = lunr(ref="id", fields=["body"], documents=documents)
+table = HybridCarTable.from_csv(CSV_PATH)
+# Máximo de rondas de llamadas a la herramienta antes de pedir la respuesta final
+MAX_TOOL_ROUNDS = int(os.getenv("MAX_TOOL_ROUNDS", "3"))
 
 # Obteneemos la pregunta del usuario
 user_question = "¿qué tan rápido es el Prius v?"
 
-# Buscamos en el índice la pregunta del usuario
-results = index.search(user_question)
-matching_rows = [rows[int(result["ref"])] for result in results]
-
-# Formateamos como tabla markdown, ya que los llms entienden markdown
-matches_table = " | ".join(rows[0]) + "\n" + " | ".join(" --- " for _ in range(len(rows[0]))) + "\n"
-matches_table += "\n".join(" | ".join(row) for row in matching_rows)
-
-print("Found matches:")
-print(matches_table)
-
-# Ahora podemos usar los resultados para generar una respuesta
 SYSTEM_MESSAGE = """
 Eres un asistente útil que responde preguntas sobre automóviles basándote en un conjunto de datos de autos híbridos.
+Usa la herramienta consultar_autos para obtener sólo las filas necesarias, filtrando, ordenando y limitando la tabla.
 Debes utilizar el conjunto de datos para responder las preguntas, no debes
 proporcionar ninguna información que no esté en las fuentes proporcionadas.
 """
-
-response = client.chat.completions.create(
-    model=MODEL_NAME,
-    temperature=0.3,
-    messages=[
-        {"role": "system", "content": SYSTEM_MESSAGE},
-        {"role": "user", "content": f"{user_question}\nSources: {matches_table}"},
-    ],
-)
+messages = [
+    {"role": "system", "content": SYSTEM_MESSAGE},
+    {"role": "user", "content": user_question},
+]
+
+# Dejamos que el modelo decida cómo consultar la tabla; puede hacer varias consultas seguidas
+# (p. ej. para refinar un filtro que no devolvió filas) hasta MAX_TOOL_ROUNDS rondas
+for _ in range(MAX_TOOL_ROUNDS):
+    response = client.chat.completions.create(
+        model=MODEL_NAME,
+        temperature=0.3,
+        messages=messages,
+        tools=[QUERY_TOOL],
+    )
+    tool_calls = response.choices[0].message.tool_calls
+    if not tool_calls:
+        break
+    messages.append(response.choices[0].message)
+    for tool_call in tool_calls:
+        matches_table = table.run_tool_call(tool_call.function.arguments)
+        print(f"Consulta: {tool_call.function.arguments}")
+        print("Found matches:")
+        print(matches_table)
+        messages.append({"role": "tool", "tool_call_id": tool_call.id, "content": matches_table})
+else:
+    # Se agotaron las rondas: pedimos la respuesta con los resultados que ya tenemos
+    response = client.chat.completions.create(model=MODEL_NAME, temperature=0.3, messages=messages)
 
 print(f"\nRespuest de {API_HOST}: \n")
-print(response.choices[0].message.content)
\ No newline at end of file
+print(response.choices[0].message.content)
@@ -1,42 +1,27 @@
-import json
 import os
 
-import azure.identity
-import openai
 from dotenv import load_dotenv
-from lunr import lunr
+
+from bm25 import BM25Index
+from context_builder import build_context
+from llm_common.openai_clients import get_client, get_host, get_model_name
+from llm_common.vector_store import VectorStore
 
 # Configura el cliente de OpenAI para usar la API de Azure, OpenAI.com u Ollama
 load_dotenv(override=True)
-API_HOST = os.getenv("API_HOST", "github")
-
-if API_HOST == "azure":
-    token_provider = azure.identity.get_bearer_token_provider(
-        azure.identity.DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default"
-    )
-    client = openai.OpenAI(
-        base_url=os.environ["AZURE_OPENAI_ENDPOINT"],
-        api_key=token_provider,
-    )
-    MODEL_NAME = os.environ["AZURE_OPENAI_CHAT_DEPLOYMENT"]
-
-elif API_HOST == "ollama":
-    client = openai.OpenAI(base_url=os.environ["OLLAMA_ENDPOINT"], api_key="nokeyneeded")
-    MODEL_NAME = os.environ["OLLAMA_MODEL"]
-
-elif API_HOST == "github":
-    client = openai.OpenAI(base_url="https://models.github.ai/inference", api_key=os.environ["GITHUB_TOKEN"])
-    MODEL_NAME = os.getenv("GITHUB_MODEL", "openai/gpt-4o")
+API_HOST = get_host()
+client = get_client(API_HOST)
+MODEL_NAME = get_model_name(API_HOST)
 
-else:
-    client = openai.OpenAI(api_key=os.environ["OPENAI_KEY"])
-    MODEL_NAME = os.environ["OPENAI_MODEL"]
+# Indexar los datos del almacén binario - sólo necesitamos id y texto, los embeddings no se leen del disco
+vector_store = VectorStore.load("rag_ingested_chunks")
+documents = vector_store.documents
+documents_by_id = vector_store.documents_by_id
+# Índice BM25 con analizador para español; se reutiliza desde disco mientras los fragmentos no cambien
+index = BM25Index.load_or_build(documents, ref="id", fields=["text"], path="rag_ingested_chunks.bm25.npz")
 
-# Indexar los datos del JSON - cada objeto tiene id, texto y embedding
-with open("rag_ingested_chunks.json") as file:
-    documents = json.load(file)
-    documents_by_id = {doc["id"]: doc for doc in documents}
-index = lunr(ref="id", fields=["text"], documents=documents)
+# Presupuesto de tokens para las fuentes que se envían al modelo
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "2000"))
 
 # Obtener la pregunta del usuario
 user_question = "¿como se llama la abeja doméstica?"
@@ -44,8 +29,10 @@ user_question = "¿como se llama la abeja doméstica?"
 # Buscar la pregunta del usuario en el índice
 results = index.search(user_question)
 retrieved_documents = [documents_by_id[result["ref"]] for result in results]
-print(f"{len(retrieved_documents)} documentos recuperados coincidentes. Enviando sólo los primeros 5.")
-context = "\n".join([f"{doc['id']}: {doc['text']}" for doc in retrieved_documents[0:5]])
+print(f"{len(retrieved_documents)} documentos recuperados coincidentes.")
+# Enviar los más relevantes que quepan en el presupuesto, sin repetir fragmentos duplicados
+context, context_stats = build_context(retrieved_documents, max_tokens=CONTEXT_MAX_TOKENS, model=MODEL_NAME)
+print(f"Contexto: {context_stats}")
 
 # Ahora podemos usar las coincidencias para generar una respuesta
 SYSTEM_MESSAGE = """
@@ -1,72 +1,103 @@
-import json
+import asyncio
 import os
 
-import azure.identity
-import openai
 from dotenv import load_dotenv
-from lunr import lunr
-from sentence_transformers import CrossEncoder
+
+from bm25 import BM25Index
+from context_builder import build_context
+from llm_common.openai_clients import get_client, get_host, get_model_name
+from llm_common.query_embedding_cache import QueryEmbeddingCache
+from llm_common.vector_store import VectorStore
+from reranker import Reranker
 
 # Configura el cliente de OpenAI para usar la API de Azure, OpenAI.com u Ollama
+# (el cliente asíncrono se usa para la búsqueda híbrida concurrente)
 load_dotenv(override=True)
-API_HOST = os.getenv("API_HOST", "github")
-
-if API_HOST == "azure":
-    token_provider = azure.identity.get_bearer_token_provider(
-        azure.identity.DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default"
+API_HOST = get_host()
+client = get_client(API_HOST)
+async_client = get_client(API_HOST, asynchronous=True)
+MODEL_NAME = get_model_name(API_HOST)
+
+# Indexar los datos del almacén binario - cada documento tiene id y texto, y los embeddings se mapean desde disco
+vector_store = VectorStore.load("rag_ingested_chunks")
+documents = vector_store.documents
+documents_by_id = vector_store.documents_by_id
+# Índice BM25 con analizador para español; se reutiliza desde disco mientras los fragmentos no cambien
+index = BM25Index.load_or_build(documents, ref="id", fields=["text"], path="rag_ingested_chunks.bm25.npz")
+# Búsqueda vectorial exacta sobre la matriz (por defecto) o aproximada con un índice HNSW guardado en disco
+VECTOR_SEARCH_BACKEND = os.getenv("VECTOR_SEARCH_BACKEND", "exact")
+if VECTOR_SEARCH_BACKEND == "hnsw":
+    from ann_index import ANNIndex
+
+    vector_index = ANNIndex.load_or_build(
+        documents, vector_store.embeddings, "rag_ingested_chunks.hnsw", source_fingerprint=vector_store.fingerprint
     )
-    client = openai.OpenAI(
-        base_url=os.environ["AZURE_OPENAI_ENDPOINT"],
-        api_key=token_provider,
-    )
-    MODEL_NAME = os.environ["AZURE_OPENAI_CHAT_DEPLOYMENT"]
+else:
+    vector_index = vector_store
+# Con VECTOR_SEARCH_DIMENSIONS (p. ej. 256), la búsqueda exacta hace una primera pasada con ese prefijo
+# de los embeddings y reordena los candidatos con el vector completo
+VECTOR_SEARCH_DIMENSIONS = int(os.getenv("VECTOR_SEARCH_DIMENSIONS", "0")) or None
 
-elif API_HOST == "ollama":
-    client = openai.OpenAI(base_url=os.environ["OLLAMA_ENDPOINT"], api_key="nokeyneeded")
-    MODEL_NAME = os.environ["OLLAMA_MODEL"]
+# Caché de embeddings de consultas: LRU en memoria y, si se define QUERY_EMBEDDING_CACHE_PATH, SQLite en disco
+EMBEDDING_MODEL = "text-embedding-3-small"
+query_embedding_cache = QueryEmbeddingCache(disk_path=os.getenv("QUERY_EMBEDDING_CACHE_PATH"))
 
-elif API_HOST == "github":
-    client = openai.OpenAI(base_url="https://models.github.ai/inference", api_key=os.environ["GITHUB_TOKEN"])
-    MODEL_NAME = os.getenv("GITHUB_MODEL", "openai/gpt-4o")
 
-else:
-    client = openai.OpenAI(api_key=os.environ["OPENAI_KEY"])
-    MODEL_NAME = os.environ["OPENAI_MODEL"]
+def get_query_embedding(query):
+    """
+    Obtener el embedding de la consulta, llamando a la API sólo si no está en caché.
+    """
+
+    def create(text):
+        return client.embeddings.create(model=EMBEDDING_MODEL, input=text).data[0].embedding
+
+    return query_embedding_cache.get_or_create(query, EMBEDDING_MODEL, create)
+
+
+async def get_query_embedding_async(query):
+    """
+    Versión asíncrona de `get_query_embedding`.
+    """
+
+    async def create(text):
+        return (await async_client.embeddings.create(model=EMBEDDING_MODEL, input=text)).data[0].embedding
+
+    return await query_embedding_cache.get_or_create_async(query, EMBEDDING_MODEL, create)
+
 
-# Indexar los datos del JSON - cada objeto tiene id, texto y embedding
-with open("rag_ingested_chunks.json") as file:
-    documents = json.load(file)
-    documents_by_id = {doc["id"]: doc for doc in documents}
-index = lunr(ref="id", fields=["text"], documents=documents)
+# Reclasificador cross-encoder: el modelo se carga una sola vez y se reutiliza en cada consulta.
+# Empieza a cargarse en segundo plano ahora, así que la carga se solapa con la búsqueda de la consulta
+reranker = Reranker("cross-encoder/ms-marco-MiniLM-L-6-v2", batch_size=32, max_candidates=20)
+reranker.preload()
 
 
 def full_text_search(query, limit):
     """
     Realizar una búsqueda de texto completo en los documentos indexados.
     """
-    results = index.search(query)
-    retrieved_documents = [documents_by_id[result["ref"]] for result in results[:limit]]
+    results = index.search(query, limit)
+    retrieved_documents = [documents_by_id[result["ref"]] for result in results]
     return retrieved_documents
 
 
 def vector_search(query, limit):
     """
-    Realizar una búsqueda vectorial en los documentos indexados
-    utilizando una función simple de similitud de coseno.
+    Realizar una búsqueda vectorial en los documentos indexados utilizando la similitud de coseno,
+    exacta sobre la matriz de embeddings normalizada o aproximada con el índice HNSW.
     """
+    query_embedding = get_query_embedding(query)
+    return vector_search_by_embedding(query_embedding, limit)
 
-    def cosine_similarity(a, b):
-        return sum(x * y for x, y in zip(a, b)) / ((sum(x * x for x in a) ** 0.5) * (sum(y * y for y in b) ** 0.5))
 
-    query_embedding = client.embeddings.create(model="text-embedding-3-small", input=query).data[0].embedding
-    similarities = []
-    for doc in documents:
-        doc_embedding = doc["embedding"]
-        similarity = cosine_similarity(query_embedding, doc_embedding)
-        similarities.append((doc, similarity))
-    similarities.sort(key=lambda x: x[1], reverse=True)
-
-    retrieved_documents = [doc for doc, _ in similarities[:limit]]
+def vector_search_by_embedding(query_embedding, limit):
+    """
+    Realizar la búsqueda vectorial a partir de un embedding de consulta ya calculado.
+    """
+    if vector_index is vector_store:
+        results = vector_store.search(query_embedding, limit, dimensions=VECTOR_SEARCH_DIMENSIONS)
+    else:
+        results = vector_index.search(query_embedding, limit)
+    retrieved_documents = [doc for doc, _ in results]
     return retrieved_documents
 
 
@@ -91,16 +122,6 @@ def reciprocal_rank_fusion(text_results, vector_results, k=60):
     return retrieved_documents
 
 
-def rerank(query, retrieved_documents):
-    """
-    Reclasificar los resultados utilizando un cross-enconder modelo .
-    """
-    encoder = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2")
-    scores = encoder.predict([(query, doc["text"]) for doc in retrieved_documents])
-    scored_documents = [v for _, v in sorted(zip(scores, retrieved_documents), reverse=True)]
-    return scored_documents
-
-
 def hybrid_search(query, limit):
     """
     Realizar una búsqueda híbrida utilizando tanto búsqueda de texto completo como vectorial.
@@ -108,17 +129,39 @@ def hybrid_search(query, limit):
     text_results = full_text_search(query, limit * 2)
     vector_results = vector_search(query, limit * 2)
     fused_results = reciprocal_rank_fusion(text_results, vector_results)
-    reranked_results = rerank(query, fused_results)
+    reranked_results = reranker.rerank(query, fused_results)
     return reranked_results[:limit]
 
 
+async def hybrid_search_async(query, limit):
+    """
+    Versión asíncrona de la búsqueda híbrida: la solicitud del embedding de la consulta
+    y la búsqueda de texto completo se ejecutan a la vez, así que la latencia es
+    aproximadamente max(texto, vector) en lugar de la suma.
+    """
+    query_embedding, text_results = await asyncio.gather(
+        get_query_embedding_async(query),
+        asyncio.to_thread(full_text_search, query, limit * 2),
+    )
+    vector_results = vector_search_by_embedding(query_embedding, limit * 2)
+    fused_results = reciprocal_rank_fusion(text_results, vector_results)
+    reranked_results = await reranker.rerank_async(query, fused_results)
+    return reranked_results[:limit]
+
+
+# Presupuesto de tokens para las fuentes que se envían al modelo
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "2000"))
+
 # Obtener la pregunta del usuario
 user_question = "como se llama el insecto que de color gris y es peludito?"
 
 # Buscar la pregunta del usuario en el índice
-retrieved_documents = hybrid_search(user_question, limit=5)
+retrieved_documents = asyncio.run(hybrid_search_async(user_question, limit=5))
 print(f"Recuperados {len(retrieved_documents)} documentos coincidentes.")
-context = "\n".join([f"{doc['id']}: {doc['text']}" for doc in retrieved_documents[0:5]])
+print(f"Caché de embeddings de consultas: {query_embedding_cache.stats()}")
+# Enviar los más relevantes que quepan en el presupuesto, sin repetir fragmentos duplicados
+context, context_stats = build_context(retrieved_documents, max_tokens=CONTEXT_MAX_TOKENS, model=MODEL_NAME)
+print(f"Contexto: {context_stats}")
 
 # Ahora podemos usar las coincidencias para generar una respuesta
 SYSTEM_MESSAGE = """
@@ -1,60 +1,125 @@
-import json
+import asyncio
 import os
 import pathlib
 
-import azure.identity
-import openai
-import pymupdf4llm
 from dotenv import load_dotenv
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-# Configura el cliente de OpenAI para usar la API de Azure, OpenAI.com u Ollama
+from bm25 import BM25Index
+from embedding_batches import embed_texts
+from ingestion_cache import IngestionCache
+from ingestion_checkpoint import IngestionCheckpoint
+from llm_common.openai_clients import get_client, get_host, get_model_name
+from llm_common.vector_store import BinaryStoreWriter
+from pdf_extraction import extract_files
+
+# Configura el cliente asíncrono de OpenAI para usar la API de Azure, OpenAI.com u Ollama
+# Los reintentos con backoff los maneja embed_texts, así que desactivamos los del SDK
 load_dotenv(override=True)
-API_HOST = os.getenv("API_HOST", "github")
+API_HOST = get_host()
+client = get_client(API_HOST, asynchronous=True, max_retries=0)
+MODEL_NAME = get_model_name(API_HOST)
 
-if API_HOST == "azure":
-    token_provider = azure.identity.get_bearer_token_provider(
-        azure.identity.DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default"
-    )
-    client = openai.OpenAI(
-        base_url=os.environ["AZURE_OPENAI_ENDPOINT"],
-        api_key=token_provider,
+EMBEDDING_MODEL = "text-embedding-3-small"
+# Número de fragmentos por solicitud y de solicitudes simultáneas a la API de embeddings
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+# Número de procesos para extraer y dividir PDFs (por defecto, uno por núcleo)
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "0")) or None
+
+data_dir = pathlib.Path(os.path.dirname(__file__)) / "data"
+filenames = ["Xylocopa_californica.pdf", "Centris_pallida.pdf", "Apis_mellifera.pdf", "Syrphidae.pdf"]
+
+
+async def embed_file_chunks(cache, file_chunks, semaphore):
+    """
+    Asignar embeddings a los fragmentos de un archivo, generando con la API
+    sólo los que no están en el caché.
+    """
+    embeddings_by_text = cache.get_embeddings(EMBEDDING_MODEL, [chunk["text"] for chunk in file_chunks])
+    missing_texts = list(
+        dict.fromkeys(chunk["text"] for chunk in file_chunks if chunk["text"] not in embeddings_by_text)
     )
-    MODEL_NAME = os.environ["AZURE_OPENAI_CHAT_DEPLOYMENT"]
+    if missing_texts:
+        new_embeddings = await embed_texts(
+            client, missing_texts, model=EMBEDDING_MODEL, batch_size=EMBEDDING_BATCH_SIZE, semaphore=semaphore
+        )
+        cache.put_embeddings(EMBEDDING_MODEL, missing_texts, new_embeddings)
+        embeddings_by_text.update(zip(missing_texts, new_embeddings))
+    for chunk in file_chunks:
+        chunk["embedding"] = embeddings_by_text[chunk["text"]]
 
-elif API_HOST == "ollama":
-    client = openai.OpenAI(base_url=os.environ["OLLAMA_ENDPOINT"], api_key="nokeyneeded")
-    MODEL_NAME = os.environ["OLLAMA_MODEL"]
 
-elif API_HOST == "github":
-    client = openai.OpenAI(base_url="https://models.github.ai/inference", api_key=os.environ["GITHUB_TOKEN"])
-    MODEL_NAME = os.getenv("GITHUB_MODEL", "openai/gpt-4o")
+async def ingest_files(cache, filenames):
+    """
+    Pipeline de ingesta: extraer -> dividir -> generar embeddings.
+    Entrega (archivo, fragmentos con embedding) a medida que cada archivo termina,
+    en el orden en que terminan.
+    """
+    # Semáforo compartido: limita las solicitudes de embeddings en vuelo entre todos los archivos
+    semaphore = asyncio.Semaphore(EMBEDDING_MAX_CONCURRENCY)
+    queue = asyncio.Queue()
 
-else:
-    client = openai.OpenAI(api_key=os.environ["OPENAI_KEY"])
-    MODEL_NAME = os.environ["OPENAI_MODEL"]
+    async def embed_file(filename, file_chunks):
+        await embed_file_chunks(cache, file_chunks, semaphore)
+        await queue.put((filename, file_chunks))
 
-data_dir = pathlib.Path(os.path.dirname(__file__)) / "data"
-filenames = ["Xylocopa_californica.pdf", "Centris_pallida.pdf", "Apis_mellifera.pdf", "Syrphidae.pdf"]
-all_chunks = []
-for filename in filenames:
-    # Extraemos texto del archivo PDF
-    md_text = pymupdf4llm.to_markdown(data_dir / filename)
-
-    # Dividimos el texto en fragmentos más pequeños
-    text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-        model_name="gpt-4o", chunk_size=500, chunk_overlap=125
-    )
-    texts = text_splitter.create_documents([md_text])
-    file_chunks = [{"id": f"{filename}-{(i + 1)}", "text": text.page_content} for i, text in enumerate(texts)]
+    async def produce():
+        try:
+            async with asyncio.TaskGroup() as group:
+                files_to_extract = []
+                for filename in filenames:
+                    file_chunks = cache.get_file_chunks(data_dir / filename)
+                    if file_chunks is None:
+                        files_to_extract.append(data_dir / filename)
+                        continue
+                    print(f"{filename} no ha cambiado, reutilizando {len(file_chunks)} fragmentos.")
+                    group.create_task(embed_file(filename, file_chunks))
+
+                # Extraemos y dividimos los PDFs en un pool de procesos; cada archivo pasa a la etapa
+                # de embeddings en cuanto termina, mientras los demás se siguen extrayendo
+                async for filename, file_chunks in extract_files(files_to_extract, max_workers=EXTRACTION_WORKERS):
+                    print(f"{filename} extraído en {len(file_chunks)} fragmentos.")
+                    cache.put_file_chunks(data_dir / filename, file_chunks)
+                    group.create_task(embed_file(filename, file_chunks))
+        finally:
+            await queue.put(None)
+
+    producer = asyncio.create_task(produce())
+    while (item := await queue.get()) is not None:
+        yield item
+    await producer
+
+
+async def main():
+    # Caché persistente de fragmentos por archivo y de embeddings por (modelo, hash del texto),
+    # para que una nueva ingesta sólo procese los PDFs y fragmentos que cambiaron
+    cache = IngestionCache(os.getenv("INGESTION_CACHE_PATH", "rag_ingestion_cache.sqlite"))
+
+    # Cada archivo terminado se anexa al checkpoint; si la ingesta anterior se interrumpió,
+    # se reanuda a partir de los archivos que ya estaban completos
+    checkpoint = IngestionCheckpoint(os.getenv("INGESTION_CHECKPOINT_PATH", "rag_ingested_chunks.jsonl"))
+    if checkpoint.completed_files:
+        print(f"Reanudando la ingesta: {len(checkpoint.completed_files)} archivos ya completados.")
+    pending_filenames = [filename for filename in filenames if filename not in checkpoint.completed_files]
+
+    async for filename, file_chunks in ingest_files(cache, pending_filenames):
+        checkpoint.append_file(filename, file_chunks)
+        print(f"{filename} guardado ({len(checkpoint.completed_files)}/{len(filenames)}).")
+    cache.close()
+
+    # Guardamos los documentos en un sidecar JSON y los embeddings en un archivo binario float32,
+    # leyendo el checkpoint fragmento por fragmento
+    # (para convertir un rag_ingested_chunks.json antiguo: python -m llm_common.vector_store rag_ingested_chunks.json)
+    with BinaryStoreWriter("rag_ingested_chunks") as writer:
+        for chunk in checkpoint.iter_chunks():
+            writer.append([chunk], [chunk["embedding"]])
+    print(f"{len(writer.documents)} fragmentos guardados.")
+    checkpoint.remove()
+
+    # Construimos de una vez el índice BM25, para que los scripts de búsqueda no tengan que hacerlo al arrancar
+    BM25Index.load_or_build(writer.documents, ref="id", fields=["text"], path="rag_ingested_chunks.bm25.npz")
 
-    # Generamos embeddings utilizando el SDK de openAI para cada texto
-    for file_chunk in file_chunks:
-        file_chunk["embedding"] = (
-            client.embeddings.create(model="text-embedding-3-small", input=file_chunk["text"]).data[0].embedding
-        )
-    all_chunks.extend(file_chunks)
 
-# Guardamos los documentos con embeddings en un archivo JSON
-with open("rag_ingested_chunks.json", "w") as f:
-    json.dump(all_chunks, f, indent=4)
\ No newline at end of file
+# Necesario para el pool de procesos: con "spawn" los workers vuelven a importar este módulo
+if __name__ == "__main__":
+    asyncio.run(main())
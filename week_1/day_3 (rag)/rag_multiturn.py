@@ -1,57 +1,48 @@
-import csv
 import os
 from pathlib import Path
 
-import azure.identity
-import openai
 from dotenv import load_dotenv
-from lunr import lunr
+
+from bm25 import BM25Index
+from context_builder import build_context
+from index_sources import csv_documents
+from llm_common.conversation_memory import ConversationMemory
+from llm_common.openai_clients import get_client, get_host, get_model_name
 
 # Configura el cliente de OpenAI para usar la API de Azure, OpenAI.com u Ollama
 load_dotenv(override=True)
-API_HOST = os.getenv("API_HOST", "github")
-
-if API_HOST == "azure":
-    token_provider = azure.identity.get_bearer_token_provider(
-        azure.identity.DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default"
-    )
-    client = openai.OpenAI(
-        base_url=os.environ["AZURE_OPENAI_ENDPOINT"],
-        api_key=token_provider,
-    )
-    MODEL_NAME = os.environ["AZURE_OPENAI_CHAT_DEPLOYMENT"]
-
-elif API_HOST == "ollama":
-    client = openai.OpenAI(base_url=os.environ["OLLAMA_ENDPOINT"], api_key="nokeyneeded")
-    MODEL_NAME = os.environ["OLLAMA_MODEL"]
-
-elif API_HOST == "github":
-    client = openai.OpenAI(base_url="https://models.github.ai/inference", api_key=os.environ["GITHUB_TOKEN"])
-    MODEL_NAME = os.getenv("GITHUB_MODEL", "openai/gpt-4o")
-
-else:
-    client = openai.OpenAI(api_key=os.environ["OPENAI_KEY"])
-    MODEL_NAME = os.environ["OPENAI_MODEL"]
+API_HOST = get_host()
+client = get_client(API_HOST)
+MODEL_NAME = get_model_name(API_HOST)
 
 # Indexamos los datos del CSV
 
 CSV_PATH = Path(__file__).with_name("hybridos.csv")
-with CSV_PATH.open(newline="", encoding="utf-8") as file:
-    reader = csv.reader(file)
-    rows = list(reader)
-documents = [{"id": (i + 1), "body": " ".join(row)} for i, row in enumerate(rows[1:])]
-index = lunr(ref="id", fields=["body"], documents=documents)
+rows, documents = csv_documents(CSV_PATH)
+# Índice BM25 con analizador para español; se reutiliza desde disco mientras el CSV no cambie
+index = BM25Index.load_or_build(documents, ref="id", fields=["body"], path=CSV_PATH.with_suffix(".bm25.npz"))
+
+# Presupuesto de tokens para las filas que se envían al modelo
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "1000"))
 
 
 def search(query):
-    # Buscamos en el índice la pregunta del usuario
-    query = query.lower().replace("?", "")
+    # Buscamos en el índice la pregunta del usuario (el analizador ya ignora mayúsculas, acentos y puntuación)
     results = index.search(query)
     matching_rows = [rows[int(result["ref"])] for result in results]
 
-    # Formateamos como tabla markdown, ya que los llms entienden markdown
-    matches_table = " | ".join(rows[0]) + "\n" + " | ".join(" --- " for _ in range(len(rows[0]))) + "\n"
-    matches_table += "\n".join(" | ".join(row) for row in matching_rows)
+    # Formateamos como tabla markdown, ya que los llms entienden markdown,
+    # con las filas más relevantes que quepan en el presupuesto de tokens
+    table_header = " | ".join(rows[0]) + "\n" + " | ".join(" --- " for _ in range(len(rows[0])))
+    matches_table, context_stats = build_context(
+        matching_rows,
+        max_tokens=CONTEXT_MAX_TOKENS,
+        get_text=lambda row: " | ".join(row),
+        format_source=lambda row, text: text,
+        header=table_header,
+        model=MODEL_NAME,
+    )
+    print(f"Contexto: {context_stats}")
     return matches_table
 
 
@@ -60,7 +51,8 @@ Eres un asistente útil que responde preguntas sobre automóviles basándote en
 Debes utilizar el conjunto de datos para responder las preguntas, no debes proporcionar ninguna información que no
 esté en las fuentes proporcionadas.
 """
-messages = [{"role": "system", "content": SYSTEM_MESSAGE}]
+# Historial acotado: últimos turnos sin las fuentes y un resumen de los anteriores
+memory = ConversationMemory(SYSTEM_MESSAGE, client=client, model_name=MODEL_NAME)
 
 while True:
     question = input("\nTu pregunta acerca de carros híbridos: ")
@@ -71,11 +63,11 @@ while True:
     print(matches)
 
     # Usar los resultados para generar una respuesta
-    messages.append({"role": "user", "content": f"{question}\nSources: {matches}"})
-    response = client.chat.completions.create(model=MODEL_NAME, temperature=0.3, messages=messages)
+    user_content = f"{question}\nSources: {matches}"
+    response = client.chat.completions.create(model=MODEL_NAME, temperature=0.3, messages=memory.messages(user_content))
 
     bot_response = response.choices[0].message.content
-    messages.append({"role": "assistant", "content": bot_response})
+    memory.add_turn(user_content, bot_response)
 
     print(f"\nResponse from {API_HOST} {MODEL_NAME}: \n")
     print(bot_response)
\ No newline at end of file
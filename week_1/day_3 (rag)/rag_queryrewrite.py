@@ -1,55 +1,48 @@
-import csv
 import os
 from pathlib import Path
 
-import azure.identity
-import openai
 from dotenv import load_dotenv
-from lunr import lunr
+
+from context_builder import build_context
+from index_sources import csv_documents
+from llm_common.conversation_memory import ConversationMemory
+from llm_common.openai_clients import get_client, get_host, get_model_name
+from lunr_index_cache import load_or_build_index
+from query_rewriter import QueryRewriter, build_vocabulary
 
 # Configura el cliente de OpenAI para usar la API de Azure, OpenAI.com u Ollama
 load_dotenv(override=True)
-API_HOST = os.getenv("API_HOST", "github")
-
-if API_HOST == "azure":
-    token_provider = azure.identity.get_bearer_token_provider(
-        azure.identity.DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default"
-    )
-    client = openai.OpenAI(
-        base_url=os.environ["AZURE_OPENAI_ENDPOINT"],
-        api_key=token_provider,
-    )
-    MODEL_NAME = os.environ["AZURE_OPENAI_CHAT_DEPLOYMENT"]
-
-elif API_HOST == "ollama":
-    client = openai.OpenAI(base_url=os.environ["OLLAMA_ENDPOINT"], api_key="nokeyneeded")
-    MODEL_NAME = os.environ["OLLAMA_MODEL"]
-
-elif API_HOST == "github":
-    client = openai.OpenAI(base_url="https://models.github.ai/inference", api_key=os.environ["GITHUB_TOKEN"])
-    MODEL_NAME = os.getenv("GITHUB_MODEL", "openai/gpt-4o")
-
-else:
-    client = openai.OpenAI(api_key=os.environ["OPENAI_KEY"])
-    MODEL_NAME = os.environ["OPENAI_MODEL"]
+API_HOST = get_host()
+client = get_client(API_HOST)
+MODEL_NAME = get_model_name(API_HOST)
 
 # Indexar los datos del CSV
 CSV_PATH = Path(__file__).with_name("hybridos.csv")
-with CSV_PATH.open(newline="", encoding="utf-8") as file:
-    reader = csv.reader(file)
-    rows = list(reader)
-documents = [{"id": (i + 1), "body": " ".join(row)} for i, row in enumerate(rows[1:])]
-index = lunr(ref="id", fields=["body"], documents=documents)
+rows, documents = csv_documents(CSV_PATH)
+# El índice se reutiliza desde disco mientras el CSV no cambie
+index = load_or_build_index(documents, ref="id", fields=["body"], path=CSV_PATH.with_suffix(".lunr.json"))
+
+# Presupuesto de tokens para las filas que se envían al modelo
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "1000"))
+# Buscar con la pregunta original mientras el LLM reescribe la consulta
+SPECULATIVE_SEARCH = os.getenv("SPECULATIVE_SEARCH", "true").lower() == "true"
 
 
-def search(query):
-    # Buscar en el índice la pregunta del usuario
-    results = index.search(query)
+def format_matches(results):
     matching_rows = [rows[int(result["ref"])] for result in results]
 
-    # Formatear como una tabla markdown, ya que los modelos de lenguaje entienden markdown
-    matches_table = " | ".join(rows[0]) + "\n" + " | ".join(" --- " for _ in range(len(rows[0]))) + "\n"
-    matches_table += "\n".join(" | ".join(row) for row in matching_rows)
+    # Formatear como una tabla markdown, ya que los modelos de lenguaje entienden markdown,
+    # con las filas más relevantes que quepan en el presupuesto de tokens
+    table_header = " | ".join(rows[0]) + "\n" + " | ".join(" --- " for _ in range(len(rows[0])))
+    matches_table, context_stats = build_context(
+        matching_rows,
+        max_tokens=CONTEXT_MAX_TOKENS,
+        get_text=lambda row: " | ".join(row),
+        format_source=lambda row, text: text,
+        header=table_header,
+        model=MODEL_NAME,
+    )
+    print(f"Contexto: {context_stats}")
     return matches_table
 
 
@@ -61,17 +54,11 @@ Se te proporcionará la nueva pregunta del usuario y el historial de conversaci
 Responde SÓLO con la consulta de keyword sugerida, sin texto adicional.
 """
 
-SYSTEM_MESSAGE = """
-Eres un asistente útil que responde preguntas sobre automóviles basándose en un conjunto de datos de coches híbridos.
-Debes utilizar el conjunto de datos para responder las preguntas, no debes proporcionar información que no
-esté en las fuentes proporcionadas.
-"""
-messages = [{"role": "system", "content": SYSTEM_MESSAGE}]
-
-while True:
-    question = input("\nTu pregunta sobre coches eléctricos: ")
 
-    # Reescribir la consulta para corregir errores tipográficos e incorporar contexto pasado
+def rewrite_with_llm(question, history):
+    """
+    Reescribir la pregunta con el modelo, usando el historial para resolver referencias.
+    """
     response = client.chat.completions.create(
         model=MODEL_NAME,
         temperature=0.05,
@@ -79,23 +66,45 @@ while True:
             {"role": "system", "content": QUERY_REWRITE_SYSTEM_MESSAGE},
             {
                 "role": "user",
-                "content": f"Nueva pregunta del usuario:{question}\n\nHistorial de conversación:{messages}",
+                "content": f"Nueva pregunta del usuario:{question}\n\nHistorial de conversación:\n{history}",
             },
         ],
     )
-    search_query = response.choices[0].message.content
+    return response.choices[0].message.content
+
+
+# Reescritura local contra el vocabulario del índice; el LLM sólo se usa cuando hace falta
+query_rewriter = QueryRewriter(build_vocabulary(document["body"] for document in documents), rewrite_with_llm)
+
+SYSTEM_MESSAGE = """
+Eres un asistente útil que responde preguntas sobre automóviles basándose en un conjunto de datos de coches híbridos.
+Debes utilizar el conjunto de datos para responder las preguntas, no debes proporcionar información que no
+esté en las fuentes proporcionadas.
+"""
+# Historial acotado: últimos turnos sin las fuentes y un resumen de los anteriores
+memory = ConversationMemory(SYSTEM_MESSAGE, client=client, model_name=MODEL_NAME)
+
+while True:
+    question = input("\nTu pregunta sobre coches eléctricos: ")
+
+    # Reescribir la consulta para corregir errores tipográficos e incorporar contexto pasado,
+    # y buscar en el índice del CSV (en modo especulativo, ambas cosas a la vez)
+    if SPECULATIVE_SEARCH:
+        search_query, results = query_rewriter.rewrite_and_search(question, memory.history_text(), index.search)
+    else:
+        search_query, results = query_rewriter.rewrite(question, memory.history_text(), index.search)
     print(f"Consulta reescrita: {search_query}")
+    print(f"Reescrituras: {query_rewriter.stats()}")
 
-    # Buscar en el CSV la pregunta
-    matches = search(search_query)
+    matches = format_matches(results)
     print("Coincidencias encontradas:\n", matches)
 
     # Usar las coincidencias para generar una respuesta
-    messages.append({"role": "user", "content": f"{question}\nFuentes: {matches}"})
-    response = client.chat.completions.create(model=MODEL_NAME, temperature=0.3, messages=messages)
+    user_content = f"{question}\nFuentes: {matches}"
+    response = client.chat.completions.create(model=MODEL_NAME, temperature=0.3, messages=memory.messages(user_content))
 
     bot_response = response.choices[0].message.content
-    messages.append({"role": "assistant", "content": bot_response})
+    memory.add_turn(user_content, bot_response)
 
     print(f"\nRespuesta de {API_HOST} {MODEL_NAME}: \n")
     print(bot_response)
\ No newline at end of file
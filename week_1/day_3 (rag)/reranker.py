@@ -0,0 +1,104 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Reranker:
+    """
+    Servicio de reclasificación con un modelo cross-encoder que se carga una sola vez, la primera vez
+    que se necesita (o antes, en segundo plano, con `preload`).
+    Puntúa los candidatos en lotes, sólo los primeros `max_candidates`, y guarda
+    los puntajes de (consulta, id de documento) en un caché LRU.
+    """
+
+    def __init__(
+        self,
+        model_name="cross-encoder/ms-marco-MiniLM-L-6-v2",
+        batch_size=32,
+        max_candidates=20,
+        cache_size=2048,
+    ):
+        self.model_name = model_name
+        self.encoder = None
+        self.encoder_lock = threading.Lock()
+        self.batch_size = batch_size
+        self.max_candidates = max_candidates
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+        # Un solo hilo en segundo plano: la inferencia en CPU no bloquea el bucle de eventos
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reranker")
+
+    def load(self):
+        """
+        Cargar el modelo si todavía no está cargado. sentence_transformers (y con él torch) se importa aquí,
+        así que importar este módulo o crear el servicio no alarga el arranque del script.
+        """
+        with self.encoder_lock:
+            if self.encoder is None:
+                from sentence_transformers import CrossEncoder
+
+                self.encoder = CrossEncoder(self.model_name)
+        return self.encoder
+
+    def preload(self):
+        """
+        Empezar a cargar el modelo en el hilo en segundo plano, mientras el script hace otras cosas
+        (cargar índices, calcular el embedding de la consulta); devuelve un `concurrent.futures.Future`.
+        """
+        return self.executor.submit(self.load)
+
+    def score(self, query, documents):
+        """
+        Calcular el puntaje de cada documento para la consulta, usando el caché
+        y enviando al modelo sólo los pares que faltan.
+        """
+        scores = [None] * len(documents)
+        missing = []
+        with self.cache_lock:
+            for i, doc in enumerate(documents):
+                key = (query, doc["id"])
+                if key in self.cache:
+                    self.cache.move_to_end(key)
+                    scores[i] = self.cache[key]
+                else:
+                    missing.append(i)
+        if missing:
+            predicted = self.load().predict(
+                [(query, documents[i]["text"]) for i in missing],
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+            )
+            with self.cache_lock:
+                for i, score in zip(missing, predicted):
+                    scores[i] = float(score)
+                    self.cache[(query, documents[i]["id"])] = scores[i]
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        return scores
+
+    def rerank(self, query, documents):
+        """
+        Reclasificar los primeros `max_candidates` documentos por puntaje del modelo.
+        Los documentos que quedan fuera del límite se mantienen al final, en su orden original.
+        """
+        candidates = documents[: self.max_candidates]
+        scores = self.score(query, candidates)
+        reranked = [doc for _, doc in sorted(zip(scores, candidates), key=lambda pair: pair[0], reverse=True)]
+        return reranked + documents[self.max_candidates :]
+
+    def submit(self, query, documents):
+        """
+        Reclasificar en el hilo en segundo plano; devuelve un `concurrent.futures.Future`.
+        """
+        return self.executor.submit(self.rerank, query, documents)
+
+    async def rerank_async(self, query, documents):
+        """
+        Versión asíncrona de `rerank` que no bloquea el bucle de eventos.
+        """
+        return await asyncio.wrap_future(self.submit(query, documents))
+
+    def close(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,241 @@
+import argparse
+import json
+import platform
+import time
+from datetime import UTC, datetime
+from importlib.metadata import version
+from pathlib import Path
+
+import numpy as np
+
+from ann_index import ANNIndex
+from llm_common.quantization import BinaryIndex, Int8Index
+from llm_common.vector_store import VectorStore, normalize, top_k_indices
+
+MOVIE_EMBEDDINGS_DIR = Path(__file__).parent.parent / "day_2 (vectors)" / "embeddings"
+CHUNKS_PATH = Path(__file__).with_name("rag_ingested_chunks")
+
+
+def load_movie_corpus(path):
+    """
+    Vectores de un archivo peliculas_*.json ({película: vector}).
+    """
+    with open(path, encoding="utf-8") as file:
+        movies = json.load(file)
+    return np.array(list(movies.values()), dtype=np.float32)
+
+
+def load_chunk_corpus(path):
+    """
+    Vectores de los fragmentos ingeridos, leídos del almacén binario que escribe la ingesta.
+    """
+    return np.asarray(VectorStore.load(path).embeddings, dtype=np.float32)
+
+
+def synthetic_corpus(base_vectors, size, seed=0, spread=0.7):
+    """
+    Corpus sintético de `size` vectores agrupados alrededor de los vectores reales,
+    para medir cómo escalan los backends más allá de los datos del curso.
+    """
+    rng = np.random.default_rng(seed)
+    base_vectors = normalize(np.asarray(base_vectors, dtype=np.float32))
+    dimensions = base_vectors.shape[1]
+    centers = base_vectors[rng.integers(len(base_vectors), size=size)]
+    noise = rng.normal(scale=spread / np.sqrt(dimensions), size=(size, dimensions)).astype(np.float32)
+    return normalize(centers + noise)
+
+
+def make_queries(vectors, count, seed=0, spread=0.5):
+    """
+    Consultas cercanas a vectores del corpus, pero no idénticas a ellos.
+    """
+    rng = np.random.default_rng(seed + 1)
+    dimensions = vectors.shape[1]
+    picked = vectors[rng.integers(len(vectors), size=count)]
+    noise = rng.normal(scale=spread / np.sqrt(dimensions), size=(count, dimensions)).astype(np.float32)
+    return normalize(picked + noise)
+
+
+def store_search(store):
+    """
+    Función de búsqueda sobre un `VectorStore` (o cualquier objeto con la misma interfaz)
+    que devuelve las posiciones de los documentos encontrados.
+    """
+
+    def search(query, k):
+        return [doc["id"] for doc, _ in store.search(query, k)]
+
+    return search
+
+
+def build_exact(vectors):
+    store = VectorStore([{"id": i} for i in range(len(vectors))], vectors)
+    return store_search(store), store.embeddings.nbytes
+
+
+def build_float16(vectors):
+    """
+    Vectores guardados como float16: la memoria reportada es la del almacenamiento (la mitad),
+    aunque `VectorStore` los convierte a float32 para buscar; mide la pérdida de recall.
+    """
+    embeddings = normalize(vectors).astype(np.float16)
+    store = VectorStore([{"id": i} for i in range(len(vectors))], embeddings, normalized=True)
+    return store_search(store), embeddings.nbytes
+
+
+def build_matryoshka(vectors):
+    """
+    Búsqueda gruesa con las primeras dimensiones y reordenamiento con el vector completo,
+    sobre la misma matriz (la memoria extra son sólo las normas de los prefijos).
+    """
+    store = VectorStore([{"id": i} for i in range(len(vectors))], vectors)
+
+    def search(query, k, dimensions, rescore_factor):
+        return [doc["id"] for doc, _ in store.search(query, k, dimensions=dimensions, rescore_factor=rescore_factor)]
+
+    return search, store.embeddings.nbytes
+
+
+def build_hnsw(vectors, M, ef_construction=200):
+    ann_index = ANNIndex.build([{"id": i} for i in range(len(vectors))], vectors, M=M, ef_construction=ef_construction)
+    search = store_search(ann_index)
+
+    def search_with_ef(query, k, ef):
+        ann_index.set_ef(ef)
+        return search(query, k)
+
+    return search_with_ef, ann_index.index.index_file_size()
+
+
+def build_quantized(index_class):
+    """
+    Backend sobre códigos cuantizados. Con `rescore_factor`, los vectores originales se guardan
+    en memoria para volver a puntuar y la memoria reportada los incluye.
+    """
+
+    def build(vectors, rescore_factor):
+        quantized_index = index_class.from_vectors(
+            [{"id": i} for i in range(len(vectors))],
+            vectors,
+            keep_vectors=bool(rescore_factor),
+            rescore_factor=rescore_factor,
+        )
+        search = store_search(quantized_index)
+        return search, quantized_index.memory_bytes()
+
+    return build
+
+
+# Backends: (función de construcción, barrido de parámetros de construcción, barrido de parámetros de búsqueda)
+BACKENDS = {
+    "exact": (build_exact, [{}], [{}]),
+    "float16": (build_float16, [{}], [{}]),
+    "matryoshka": (
+        build_matryoshka,
+        [{}],
+        [
+            {"dimensions": dimensions, "rescore_factor": rescore_factor}
+            for dimensions in (256, 512)
+            for rescore_factor in (0, 4)
+        ],
+    ),
+    "hnsw": (build_hnsw, [{"M": 8}, {"M": 16}, {"M": 32}], [{"ef": 10}, {"ef": 50}, {"ef": 200}]),
+    "int8": (build_quantized(Int8Index), [{"rescore_factor": 0}, {"rescore_factor": 4}], [{}]),
+    "binary": (
+        build_quantized(BinaryIndex),
+        [{"rescore_factor": 0}, {"rescore_factor": 4}, {"rescore_factor": 10}],
+        [{}],
+    ),
+}
+
+
+def benchmark_backend(name, vectors, queries, exact_results, k):
+    """
+    Construir el backend con cada combinación de parámetros y medir recall@k contra la búsqueda exacta,
+    latencia por consulta (p50/p99), tiempo de construcción y memoria de los vectores o el índice.
+    """
+    build, build_grid, search_grid = BACKENDS[name]
+    results = []
+    for build_params in build_grid:
+        start = time.perf_counter()
+        search, memory_bytes = build(vectors, **build_params)
+        build_seconds = time.perf_counter() - start
+        for search_params in search_grid:
+            if search_params.get("dimensions", 0) >= vectors.shape[1]:
+                continue
+            latencies = []
+            hits = 0
+            for query, expected in zip(queries, exact_results):
+                start = time.perf_counter()
+                found = search(query, k, **search_params)
+                latencies.append(time.perf_counter() - start)
+                hits += len(set(found) & set(expected))
+            latencies_ms = np.array(latencies) * 1000
+            results.append(
+                {
+                    "backend": name,
+                    "params": {**build_params, **search_params},
+                    "recall_at_k": hits / (len(queries) * k),
+                    "p50_ms": float(np.percentile(latencies_ms, 50)),
+                    "p99_ms": float(np.percentile(latencies_ms, 99)),
+                    "build_seconds": build_seconds,
+                    "memory_bytes": int(memory_bytes),
+                }
+            )
+    return results
+
+
+def run_benchmark(corpora, backends, k=10, num_queries=200, seed=0):
+    """
+    Ejecutar todos los backends sobre todos los corpus y devolver el reporte como diccionario.
+    """
+    report = {
+        "created_at": datetime.now(UTC).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "hnswlib": version("hnswlib"),
+            "machine": platform.machine(),
+        },
+        "k": k,
+        "num_queries": num_queries,
+        "results": [],
+    }
+    for corpus_name, vectors in corpora:
+        vectors = normalize(np.asarray(vectors, dtype=np.float32))
+        queries = make_queries(vectors, num_queries, seed)
+        corpus_k = min(k, len(vectors))
+        exact_results = top_k_indices(queries @ vectors.T, corpus_k).tolist()
+        for name in backends:
+            for result in benchmark_backend(name, vectors, queries, exact_results, corpus_k):
+                result.update({"corpus": corpus_name, "size": len(vectors), "dimensions": vectors.shape[1]})
+                report["results"].append(result)
+                print(
+                    f"{corpus_name:<45} {name:<10} {json.dumps(result['params']):<28} "
+                    f"recall@{corpus_k}={result['recall_at_k']:.3f} p50={result['p50_ms']:.3f}ms "
+                    f"p99={result['p99_ms']:.3f}ms build={result['build_seconds']:.2f}s "
+                    f"mem={result['memory_bytes'] / 1024:.0f}KiB"
+                )
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Comparar recall y latencia de los backends de búsqueda vectorial.")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--synthetic-sizes", nargs="*", type=int, default=[10_000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="vector_benchmark.json")
+    args = parser.parse_args()
+
+    corpora = [(path.name, load_movie_corpus(path)) for path in sorted(MOVIE_EMBEDDINGS_DIR.glob("peliculas_*.json"))]
+    chunk_vectors = load_chunk_corpus(CHUNKS_PATH)
+    corpora.append((CHUNKS_PATH.name, chunk_vectors))
+    for size in args.synthetic_sizes:
+        corpora.append((f"sintetico-{size}", synthetic_corpus(chunk_vectors, size, seed=args.seed)))
+
+    report = run_benchmark(corpora, args.backends, k=args.k, num_queries=args.queries, seed=args.seed)
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f"Reporte escrito en {args.output}")
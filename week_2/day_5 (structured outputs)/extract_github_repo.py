@@ -3,13 +3,14 @@ import logging
 import os
 from enum import Enum
 
-import azure.identity
-import openai
 import requests
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
 from rich import print
 
+from llm_common.completion_cache import cache_from_env, cached_client
+from llm_common.openai_clients import get_client
+
 logging.basicConfig(level=logging.WARNING)
 load_dotenv(override=True)
 
@@ -17,27 +18,24 @@ if os.getenv("OPENAI_HOST", "github") == "azure":
     if not os.getenv("AZURE_OPENAI_SERVICE") or not os.getenv("AZURE_OPENAI_GPT_DEPLOYMENT"):
         logging.warning("Las variables de entorno AZURE_OPENAI_SERVICE y AZURE_OPENAI_GPT_DEPLOYMENT están vacías. Revisa el README.")
         exit(1)
-    credential = azure.identity.AzureDeveloperCliCredential(tenant_id=os.getenv("AZURE_TENANT_ID"))
-    token_provider = azure.identity.get_bearer_token_provider(
-        credential, "https://cognitiveservices.azure.com/.default"
-    )
-    client = openai.OpenAI(
+    client = get_client(
+        "azure",
+        credential="azure_developer_cli",
+        tenant_id=os.getenv("AZURE_TENANT_ID"),
         base_url=f"https://{os.getenv('AZURE_OPENAI_SERVICE')}.openai.azure.com/openai/v1",
-        api_key=token_provider,
     )
     model_name = os.getenv("AZURE_OPENAI_GPT_DEPLOYMENT")
 else:
     if not os.getenv("GITHUB_TOKEN"):
         logging.warning("La variable de entorno GITHUB_TOKEN está vacía. Revisa el README.")
         exit(1)
-    client = openai.OpenAI(
-        base_url="https://models.github.ai/inference",
-        api_key=os.environ["GITHUB_TOKEN"],
-        # Especifica la versión de la API para usar la función de Salidas Estructuradas
-        default_query={"api-version": "2024-08-01-preview"},
-    )
+    # Especifica la versión de la API para usar la función de Salidas Estructuradas
+    client = get_client("github", default_query={"api-version": "2024-08-01-preview"})
     model_name = "openai/gpt-4o"
 
+# Con COMPLETION_CACHE_PATH, una solicitud idéntica a una anterior se responde desde disco sin llamar a la API
+client = cached_client(client, cache_from_env())
+
 # Define modelos para Salidas Estructuradas
 class Language(str, Enum):
     JAVASCRIPT = "JavaScript"
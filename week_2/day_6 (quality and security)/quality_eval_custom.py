@@ -1,31 +1,25 @@
 import os
 from pathlib import Path
 
-import azure.identity
-import openai
 import prompty
 import rich
 from dotenv import load_dotenv
 
+from llm_common.completion_cache import cache_from_env, cached_client
+from llm_common.openai_clients import get_client, get_host, get_model_name
+
 # Setup the OpenAI client to use either Azure or GitHub Models
 load_dotenv(override=True)
-API_HOST = os.getenv("API_HOST", "github")
+API_HOST = get_host()
 if API_HOST == "azure":
-    credential = azure.identity.DefaultAzureCredential()
-    token_provider = azure.identity.get_bearer_token_provider(
-        credential, "https://cognitiveservices.azure.com/.default"
-    )
-    client = openai.OpenAI(
-        base_url=os.environ["AZURE_AI_ENDPOINT"] + "openai/v1/",
-        api_key=token_provider,
-    )
+    client = get_client(API_HOST, base_url=os.environ["AZURE_AI_ENDPOINT"] + "openai/v1/")
     MODEL_NAME = os.environ["AZURE_AI_CHAT_DEPLOYMENT"]
-elif API_HOST == "github":
-    client = openai.OpenAI(
-        base_url="https://models.github.ai/inference",
-        api_key=os.environ["GITHUB_TOKEN"],
-    )
-    MODEL_NAME = os.getenv("GITHUB_MODEL", "openai/gpt-4o")
+else:
+    client = get_client(API_HOST)
+    MODEL_NAME = get_model_name(API_HOST)
+
+# Con COMPLETION_CACHE_PATH, una solicitud idéntica a una anterior se responde desde disco sin llamar a la API
+client = cached_client(client, cache_from_env())
 
 query = (
     "¡He estado en espera por 30 minutos solo para preguntar por mi equipaje! Esto es ridículo. ¿Dónde está mi maleta?"